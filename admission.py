@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Admission control for conversion requests.
+
+At most ``max_in_flight`` conversions run at once in a process. Further
+requests wait in a bounded queue and are admitted round-robin across
+clients, so one client sending many files cannot starve the others.
+Requests that cannot be queued, or that wait too long, are rejected with
+a suggested retry delay instead of slowing everyone down.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Weight of the newest sample in the moving average of slot hold times
+SERVICE_TIME_WEIGHT = 0.2
+
+
+class Overloaded(Exception):
+    """A request was not admitted; retry after ``retry_after`` seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    """A queued request waiting for a slot."""
+
+    __slots__ = ('client', 'granted')
+
+    def __init__(self, client):
+        self.client = client
+        self.granted = False
+
+
+class AdmissionController:
+    """Thread-safe limiter with a bounded, per-client fair wait queue."""
+
+    def __init__(self, max_in_flight=2, max_queue=8, max_per_client=2,
+                 queue_timeout=15.0, max_retry_after=60):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.queue_timeout = queue_timeout
+        self.max_retry_after = max_retry_after
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        # client -> requests running or queued
+        self._per_client = {}
+        # client -> queued tickets; the first client is served next
+        self._waiting = OrderedDict()
+        self._service_time = None
+        self.admitted = 0
+        self.rejected = {}
+        self.wait_seconds = 0.0
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queued(self):
+        return self._queued
+
+    def acquire(self, client):
+        """Wait for a slot for ``client`` and return the seconds waited.
+
+        Raises Overloaded if the client already has ``max_per_client``
+        requests, the queue is full, or no slot frees up within
+        ``queue_timeout`` seconds.
+        """
+        start = time.monotonic()
+        with self._cond:
+            if self._per_client.get(client, 0) >= self.max_per_client:
+                raise self._reject('client_limit')
+            self._per_client[client] = self._per_client.get(client, 0) + 1
+            if self._in_flight < self.max_in_flight and not self._queued:
+                self._in_flight += 1
+                self.admitted += 1
+                return 0.0
+            if self._queued >= self.max_queue:
+                self._forget(client)
+                raise self._reject('queue_full')
+
+            ticket = _Ticket(client)
+            self._waiting.setdefault(client, deque()).append(ticket)
+            self._queued += 1
+            deadline = start + self.queue_timeout
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._withdraw(ticket)
+                    raise self._reject('timeout')
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - start
+            self.admitted += 1
+            self.wait_seconds += waited
+            return waited
+
+    def release(self, client, held):
+        """Free the slot ``client`` held for ``held`` seconds."""
+        with self._cond:
+            self._in_flight -= 1
+            self._forget(client)
+            if self._service_time is None:
+                self._service_time = held
+            else:
+                self._service_time += SERVICE_TIME_WEIGHT * (held - self._service_time)
+            self._dispatch()
+
+    def retry_after(self):
+        """Seconds a rejected client should wait, from queue depth and hold time."""
+        with self._cond:
+            return self._retry_after()
+
+    def stats(self):
+        """Current occupancy and admission counters."""
+        with self._cond:
+            return {
+                'in_flight': self._in_flight,
+                'queued': self._queued,
+                'clients': len(self._per_client),
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'max_per_client': self.max_per_client,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'wait_seconds': round(self.wait_seconds, 3),
+                'service_seconds': round(self._service_time or 0.0, 3),
+                'retry_after': self._retry_after(),
+            }
+
+    def _retry_after(self):
+        service_time = self._service_time or 1.0
+        estimate = service_time * (self._queued + 1) / self.max_in_flight
+        return min(max(math.ceil(estimate), 1), self.max_retry_after)
+
+    def _reject(self, reason):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return Overloaded(reason, self._retry_after())
+
+    def _forget(self, client):
+        count = self._per_client[client] - 1
+        if count:
+            self._per_client[client] = count
+        else:
+            del self._per_client[client]
+
+    def _withdraw(self, ticket):
+        tickets = self._waiting[ticket.client]
+        tickets.remove(ticket)
+        if not tickets:
+            del self._waiting[ticket.client]
+        self._queued -= 1
+        self._forget(ticket.client)
+
+    def _dispatch(self):
+        """Hand free slots to queued clients in round-robin order."""
+        granted = False
+        while self._in_flight < self.max_in_flight and self._waiting:
+            client, tickets = next(iter(self._waiting.items()))
+            tickets.popleft().granted = True
+            if tickets:
+                self._waiting.move_to_end(client)
+            else:
+                del self._waiting[client]
+            self._queued -= 1
+            self._in_flight += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
@@ -4,140 +4,1063 @@ Flask web application for HTML to XML conversion.
 Serves the web interface and handles file conversion.
 """
 
-from flask import Flask, request, send_file, jsonify, render_template_string
+from flask import Flask, Request, request, send_file, jsonify, render_template_string, Response, stream_with_context
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import ClosingIterator
+import functools
+import io
+import itertools
+import multiprocessing
 import os
+import json
+import tarfile
 import tempfile
 import sys
+import threading
+import time
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from pathlib import Path
-from xml.etree.ElementTree import tostring
-from xml.dom import minidom
 
 # Import the converter classes
-from convert_html_to_xml import BankStatement
+from convert_html_to_xml import (
+    archive_output_name, check_format, convert_statement, consolidate_statements, consolidated_filename,
+    format_minor, is_archive, iter_archive_members, iter_output, iter_pretty_xml, parse_statement, read_ibank_xml, statement_header, to_minor, UnsupportedFormatError, CONVERTER_VERSION, OUTPUT_FORMATS, ROW_FIELDS,
+    SNIFF_BYTES
+)
+from admission import AdmissionController, Overloaded
+from conversion_cache import ConversionCache, cache_key
+from jobs import JobStore, run_job, DONE, FAILED
+from static_assets import StaticAssets
+import metrics
+
+class SpoolingRequest(Request):
+    """Request that keeps uploads in memory up to SPILL_THRESHOLD bytes."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=app.config['SPILL_THRESHOLD'])
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
+app.request_class = SpoolingRequest
+app.config['MAX_CONTENT_LENGTH'] = 512 * 1024 * 1024  # 512MB max request size (batch)
+app.config['MAX_FILE_SIZE'] = 100 * 1024 * 1024  # 100MB max file size
+app.config['SPILL_THRESHOLD'] = 16 * 1024 * 1024  # uploads above this are spooled to disk
+app.config['STREAM_PARSE_THRESHOLD'] = 4 * 1024 * 1024  # larger uploads use the stream backend
+app.config['PARALLEL_PARSE_THRESHOLD'] = 32 * 1024 * 1024  # larger uploads are decoded in the worker pool
+app.config['BATCH_WORKERS'] = os.cpu_count() or 1
+app.config['ARCHIVE_WINDOW'] = 2 * app.config['BATCH_WORKERS']  # archive members read ahead of the pool
+app.config['CACHE_MAX_ENTRIES'] = 256
+app.config['CACHE_MAX_BYTES'] = 64 * 1024 * 1024  # 64MB of rendered XML in memory
+app.config['CACHE_DIR'] = os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'izvodi-cache'))  # on-disk tier shared by workers ('' disables)
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 24 * 3600))  # seconds an unused disk entry is kept
+app.config['JOBS_DIR'] = os.environ.get('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'izvodi-jobs'))
+app.config['JOB_TTL'] = 3600  # seconds a finished job's result is kept
+app.config['JOB_QUEUE_LIMIT'] = 64  # pending + running jobs per web worker
+app.config['STATEMENT_CACHE_ENTRIES'] = 16  # parsed statements kept for the viewer API
+app.config['ADMISSION_MAX_IN_FLIGHT'] = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 2))  # conversions running per web worker
+app.config['ADMISSION_MAX_QUEUE'] = int(os.environ.get('ADMISSION_MAX_QUEUE', 4))  # requests waiting for a slot
+app.config['ADMISSION_MAX_PER_CLIENT'] = int(os.environ.get('ADMISSION_MAX_PER_CLIENT', 2))  # running + waiting per client
+app.config['ADMISSION_QUEUE_TIMEOUT'] = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 15))  # seconds before a waiting request gets 503
+app.config['ADMISSION_TRUST_FORWARDED'] = os.environ.get('ADMISSION_TRUST_FORWARDED') == '1'  # identify clients by X-Forwarded-For
+app.config['STATIC_RELOAD'] = os.environ.get('STATIC_RELOAD') == '1'  # re-read edited pages (development)
+app.config['STATIC_MAX_AGE'] = int(os.environ.get('STATIC_MAX_AGE', 0))  # 0: browsers revalidate with the ETag
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')  # shared by gunicorn workers; /metrics sums them
+app.config['PAGE_SIZE'] = 50
+app.config['MAX_PAGE_SIZE'] = 500
 
 ALLOWED_EXTENSIONS = {'html', 'htm'}
+PAGES = ('index.html', 'konverter.html', 'viewer.html')
+
+# Pool children come from a fork server (or are spawned) instead of being
+# forked from a multi-threaded web worker, which could copy in locks held
+# by other threads
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    POOL_CONTEXT = multiprocessing.get_context('forkserver')
+    POOL_CONTEXT.set_forkserver_preload([__name__])
+else:
+    POOL_CONTEXT = multiprocessing.get_context('spawn')
+
+_init_lock = threading.Lock()
+_executor = None
+_cache = None
+_admission = None
+_assets = None
+_ready = False
+_jobs = None
+_job_futures = set()
+_job_lock = threading.Lock()
+_last_sweep = 0.0
+_statements = OrderedDict()
+_statements_lock = threading.Lock()
+
+STAGE_SECONDS = metrics.Histogram(
+    'izvodi_stage_seconds', 'Time spent in each conversion stage.',
+    [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10], ['stage'])
+CONVERT_SECONDS = metrics.Histogram(
+    'izvodi_convert_seconds', 'Total /convert handler time by outcome.',
+    [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30], ['outcome'])
+INPUT_BYTES = metrics.Histogram(
+    'izvodi_input_bytes', 'Size of uploaded HTML statements.',
+    [1024 * 2 ** i for i in range(0, 15, 2)])
+SPAN_COUNT = metrics.Histogram(
+    'izvodi_spans', 'Number of span texts extracted per statement.',
+    [10, 100, 1000, 10000, 100000, 1000000])
+TRANSACTION_COUNT = metrics.Histogram(
+    'izvodi_transactions', 'Number of transactions parsed per statement.',
+    [0, 1, 10, 100, 1000, 10000, 100000])
+CONVERT_ERRORS = metrics.Counter(
+    'izvodi_convert_errors_total', 'Rejected or failed /convert requests by error type.', ['type'])
+ADMISSION_WAIT = metrics.Histogram(
+    'izvodi_admission_wait_seconds', 'Time admitted conversion requests waited for a slot.',
+    [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+ADMISSION_REJECTED = metrics.Counter(
+    'izvodi_admission_rejected_total', 'Conversion requests turned away with 503 by reason.', ['reason'])
+ADMISSION_IN_FLIGHT = metrics.Gauge(
+    'izvodi_admission_in_flight', 'Conversion requests currently holding a slot.')
+ADMISSION_QUEUE_DEPTH = metrics.Gauge(
+    'izvodi_admission_queue_depth', 'Conversion requests waiting for a slot.')
+
+if app.config['METRICS_DIR']:
+    metrics.set_directory(app.config['METRICS_DIR'])
+
+# Minimal statement used to exercise the whole conversion path at startup
+WARMUP_HTML = (
+    '<html><body>'
+    '<span>Izvod broj i datum: 1/01.01.2025</span>'
+    '<span>Platni račun broj: 340000000000000000</span>'
+    '<span>Krajnje stanje</span><span>1.000,00 RSD</span>'
+    '<span>PREGLED SVIH VAŠIH TRANSAKCIJA</span><span>U KORIST</span>'
+    '<span>1</span><span>01.01.2025</span><span>01.01.2025</span>'
+    '<span>Uplata</span><span>FT25001ABC</span><span>1.000,00</span>'
+    '</body></html>'
+)
 
 def allowed_file(filename):
     """Check if file has allowed extension."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def upload_size(file):
+    """Size in bytes of an uploaded file, leaving its stream rewound."""
+    file.stream.seek(0, os.SEEK_END)
+    size = file.stream.tell()
+    file.stream.seek(0)
+    return size
+
+def file_too_large(file):
+    """Check uploaded file size against MAX_FILE_SIZE."""
+    return upload_size(file) > app.config['MAX_FILE_SIZE']
+
+def too_large_message():
+    """Error message for uploads over MAX_FILE_SIZE."""
+    return f"Fajl je prevelik. Maksimalna veličina je {app.config['MAX_FILE_SIZE'] // (1024 * 1024)}MB"
+
+def parse_backend(size):
+    """Parser backend for an upload of the given size.
+
+    The stream backend decodes and parses the upload chunk by chunk, so large
+    statements are never held in memory as a whole.
+    """
+    return 'stream' if size > app.config['STREAM_PARSE_THRESHOLD'] else 'bs4'
+
+def parse_executor(size):
+    """Process pool for decoding the rows of a very large upload, or None."""
+    return get_executor() if size > app.config['PARALLEL_PARSE_THRESHOLD'] else None
+
+UNSUPPORTED_FORMAT = 'Nepodržan format fajla. Očekuje se Erste Bank HTML izvod'
+
+def conversion_error(e):
+    """Map a conversion exception to an (error message, status code) pair."""
+    if isinstance(e, UnsupportedFormatError):
+        return UNSUPPORTED_FORMAT, 415
+    error_msg = str(e)
+    if 'PREGLED SVIH VAŠIH TRANSAKCIJA' in error_msg or 'No transactions' in error_msg:
+        return 'HTML fajl ne sadrži validne transakcije', 400
+    return f'Greška pri konverziji: {error_msg}', 500
+
+def sniff_upload(file, html_only=True):
+    """Return the statement format of an upload from its first bytes only.
+
+    Raises UnsupportedFormatError, leaving the stream rewound either way.
+    """
+    head = file.stream.read(SNIFF_BYTES)
+    file.stream.seek(0)
+    return check_format(head, html_only)
+
+def sniffs_as_html(file):
+    """True if an upload sniffs as a supported HTML statement."""
+    try:
+        sniff_upload(file)
+    except UnsupportedFormatError:
+        return False
+    return True
+
+def get_executor():
+    """Return the process pool used for batch conversion."""
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=app.config['BATCH_WORKERS'],
+                                                mp_context=POOL_CONTEXT)
+    return _executor
+
+def get_cache():
+    """Return the conversion cache configured from app.config."""
+    global _cache
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                _cache = ConversionCache(
+                    max_entries=app.config['CACHE_MAX_ENTRIES'],
+                    max_bytes=app.config['CACHE_MAX_BYTES'],
+                    directory=app.config['CACHE_DIR'],
+                    disk_ttl=app.config['CACHE_TTL']
+                )
+    return _cache
+
+def get_admission():
+    """Return the admission controller configured from app.config."""
+    global _admission
+    if _admission is None:
+        with _init_lock:
+            if _admission is None:
+                _admission = AdmissionController(
+                    max_in_flight=app.config['ADMISSION_MAX_IN_FLIGHT'],
+                    max_queue=app.config['ADMISSION_MAX_QUEUE'],
+                    max_per_client=app.config['ADMISSION_MAX_PER_CLIENT'],
+                    queue_timeout=app.config['ADMISSION_QUEUE_TIMEOUT']
+                )
+    return _admission
+
+ADMISSION_IN_FLIGHT.set_function(lambda: get_admission().in_flight)
+ADMISSION_QUEUE_DEPTH.set_function(lambda: get_admission().queued)
+
+OVERLOADED = 'Server je preopterećen, pokušajte ponovo'
+
+def client_id():
+    """Key used for per-client fairness: the client address."""
+    if app.config['ADMISSION_TRUST_FORWARDED'] and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or 'unknown'
+
+def overloaded(retry_after):
+    """503 response asking the client to retry after the given seconds."""
+    response = jsonify({'error': OVERLOADED, 'retry_after': retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def admitted(view):
+    """Run a conversion view under admission control.
+
+    A response streamed from a generator keeps its slot until the server
+    closes it, so a batch ZIP counts against the limit while it is built.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        admission = get_admission()
+        client = client_id()
+        try:
+            waited = admission.acquire(client)
+        except Overloaded as e:
+            ADMISSION_REJECTED.inc(reason=e.reason)
+            return overloaded(e.retry_after)
+        ADMISSION_WAIT.observe(waited)
+        start = time.monotonic()
+
+        def release():
+            admission.release(client, time.monotonic() - start)
+            metrics.write_snapshot()
+
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            release()
+            raise
+        if response.is_streamed and not response.direct_passthrough:
+            response.response = ClosingIterator(response.response, release)
+        else:
+            release()
+        return response
+    return wrapper
+
+def get_assets():
+    """Return the in-memory store of the web interface pages."""
+    global _assets
+    if _assets is None:
+        with _init_lock:
+            if _assets is None:
+                _assets = StaticAssets(Path(__file__).parent, PAGES,
+                                       reload=app.config['STATIC_RELOAD'])
+    return _assets
+
+def serve_page(name):
+    """Serve a page from memory, compressed if accepted, with a 304 on a matching ETag."""
+    asset = get_assets().get(name)
+    encoding, body, etag = asset.negotiate(request.accept_encodings)
+    response = Response(body, mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    max_age = app.config['STATIC_MAX_AGE']
+    response.headers['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'no-cache'
+    return response.make_conditional(request)
+
+def get_jobs():
+    """Return the on-disk job store."""
+    global _jobs
+    if _jobs is None:
+        with _init_lock:
+            if _jobs is None:
+                _jobs = JobStore(app.config['JOBS_DIR'], ttl=app.config['JOB_TTL'])
+    return _jobs
+
+def submit_job(job_id, key):
+    """Run a queued job in the worker pool and cache its result."""
+    jobs = get_jobs()
+    future = get_executor().submit(run_job, str(jobs.job_dir(job_id)))
+    with _job_lock:
+        _job_futures.add(future)
+
+    def done(future):
+        with _job_lock:
+            _job_futures.discard(future)
+        if future.exception() is None:
+            try:
+                get_cache().put(key, jobs.result_path(job_id).read_bytes())
+            except OSError:
+                pass
+
+    future.add_done_callback(done)
+
+def sweep_jobs():
+    """Expire old jobs and adopt jobs orphaned by dead processes (throttled)."""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < 30:
+        return
+    _last_sweep = now
+    jobs = get_jobs()
+    for job_id, owner_pid in jobs.sweep():
+        if jobs.claim(job_id, owner_pid):
+            data = (jobs.job_dir(job_id) / 'input.html').read_bytes()
+            submit_job(job_id, cache_key(data, CONVERTER_VERSION))
+
+def job_status(meta):
+    """Public view of a job's meta data."""
+    status = {k: v for k, v in meta.items() if k != 'pid'}
+    if meta['state'] == DONE:
+        status['result_url'] = f"/jobs/{meta['id']}/result"
+    return status
+
+def record_statement(statement):
+    """Feed a converted statement's stage timings and counts into the metrics."""
+    for stage, seconds in statement.timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    SPAN_COUNT.observe(statement.span_count)
+    TRANSACTION_COUNT.observe(len(statement.transactions))
+
+def convert_rejected(error_type, message, status, start):
+    """Count a failed /convert request and return its JSON error response."""
+    CONVERT_ERRORS.inc(type=error_type)
+    CONVERT_SECONDS.observe(time.perf_counter() - start, outcome='error')
+    return jsonify({'error': message}), status
+
+def send_xml(xml_bytes, output_filename, cache_status=None):
+    """Send rendered XML as a download."""
+    response = send_file(
+        io.BytesIO(xml_bytes),
+        mimetype='application/xml',
+        as_attachment=True,
+        download_name=output_filename
+    )
+    if cache_status:
+        response.headers['X-Cache'] = cache_status
+    return response
+
+def convert_upload(data):
+    """Convert uploaded HTML bytes to XML bytes and a short summary."""
+    statement, xml_text = convert_statement(data, parse_backend(len(data)), html_only=True)
+    summary = {
+        'account': statement.account_number,
+        'statement': statement.statement_number,
+        'date': statement.statement_date,
+        'currency': statement.currency,
+        'transactions': len(statement.transactions),
+    }
+    return xml_text.encode('utf-8'), summary
+
+def remember_statement(statement_id, statement):
+    """Keep a parsed statement for the viewer API (bounded LRU)."""
+    with _statements_lock:
+        _statements[statement_id] = statement
+        _statements.move_to_end(statement_id)
+        while len(_statements) > app.config['STATEMENT_CACHE_ENTRIES']:
+            _statements.popitem(last=False)
+
+def header_key(statement_id):
+    """Cache key of the header kept next to a statement's XML."""
+    return f"{statement_id}.header.json"
+
+def cache_statement(statement_id, xml_bytes, statement):
+    """Cache a statement's XML together with the header fields the XML lacks."""
+    cache = get_cache()
+    cache.put(statement_id, xml_bytes)
+    cache.put(header_key(statement_id),
+              json.dumps(statement_header(statement), ensure_ascii=False).encode('utf-8'))
+
+def find_statement(statement_id):
+    """Return a parsed statement by id, rebuilding it from the XML cache if needed."""
+    with _statements_lock:
+        statement = _statements.get(statement_id)
+        if statement is not None:
+            _statements.move_to_end(statement_id)
+            return statement
+    if '.' in statement_id:
+        # Ids are bare hashes; dotted keys name cache sidecars
+        return None
+    cache = get_cache()
+    xml_bytes = cache.get(statement_id)
+    if xml_bytes is None:
+        return None
+    header = cache.get(header_key(statement_id))
+    statement = read_ibank_xml(io.BytesIO(xml_bytes),
+                               json.loads(header) if header is not None else None)
+    remember_statement(statement_id, statement)
+    return statement
+
+def statement_summary(statement_id, statement):
+    """Header, balances and income/outflow stats of a statement."""
+    table = statement.transactions
+    totals = table.totals_by_benefit()
+    counts = {}
+    for value in table.columns['benefit']:
+        counts[value] = counts.get(value, 0) + 1
+    dates = table.columns['dtposted']
+    credit = totals.get('credit', 0)
+    debit = totals.get('debit', 0)
+    return {
+        'id': statement_id,
+        'account': statement.account_number,
+        'statement': statement.statement_number,
+        'date': statement.statement_date,
+        'currency': statement.currency,
+        'iban': statement.iban,
+        'holder': statement.account_holder,
+        'balances': {
+            'beginning': format_minor(to_minor(statement.beginning_balance)),
+            'ending': format_minor(to_minor(statement.ending_balance)),
+        },
+        'period': {'from': min(dates)[:10] if dates else None,
+                   'to': max(dates)[:10] if dates else None},
+        'stats': {
+            'count': len(table),
+            'credit_count': counts.get('credit', 0),
+            'debit_count': counts.get('debit', 0),
+            'total_credit': format_minor(credit),
+            'total_debit': format_minor(debit),
+            'net': format_minor(credit - debit),
+        },
+    }
+
+def parse_amount_arg(name):
+    """Read an optional decimal amount query argument as minor units."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return to_minor(float(value.replace(',', '.')))
+
+def parse_upload(data):
+    """Parse uploaded HTML bytes into a BankStatement (runs in the pool)."""
+    return parse_statement(data, parse_backend(len(data)), html_only=True)
+
+class _ZipStream:
+    """Write-only buffer that lets zipfile produce a streamed archive."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def unique_name(name, used):
+    """Return name, suffixed with a counter if it was already used."""
+    if name not in used:
+        used.add(name)
+        return name
+    stem, dot, ext = name.rpartition('.')
+    counter = 2
+    while f'{stem}_{counter}.{ext}' in used:
+        counter += 1
+    name = f'{stem}_{counter}.{ext}'
+    used.add(name)
+    return name
+
 @app.route('/')
 def index():
     """Serve the main HTML page."""
-    html_path = Path(__file__).parent / 'index.html'
-    with open(html_path, 'r', encoding='utf-8') as f:
-        return f.read()
+    return serve_page('index.html')
 
 @app.route('/konverter.html')
 def konverter():
     """Serve the converter HTML page."""
-    html_path = Path(__file__).parent / 'konverter.html'
-    with open(html_path, 'r', encoding='utf-8') as f:
-        return f.read()
+    return serve_page('konverter.html')
 
 @app.route('/viewer.html')
 def viewer():
     """Serve the viewer HTML page."""
-    html_path = Path(__file__).parent / 'viewer.html'
-    with open(html_path, 'r', encoding='utf-8') as f:
-        return f.read()
+    return serve_page('viewer.html')
 
 @app.route('/convert', methods=['POST'])
+@admitted
 def convert():
     """Handle file upload and conversion."""
+    start = time.perf_counter()
+
     # Check if file is in request
     if 'html_file' not in request.files:
-        return jsonify({'error': 'Fajl nije pronađen'}), 400
+        return convert_rejected('missing_file', 'Fajl nije pronađen', 400, start)
 
     file = request.files['html_file']
 
     # Check if file is selected
     if file.filename == '':
-        return jsonify({'error': 'Niste odabrali fajl'}), 400
+        return convert_rejected('empty_filename', 'Niste odabrali fajl', 400, start)
 
     # Check if file is allowed
     if not allowed_file(file.filename):
-        return jsonify({'error': 'Nedozvoljen tip fajla. Dozvoljeni su samo .html i .htm fajlovi'}), 400
+        return convert_rejected(
+            'bad_extension', 'Nedozvoljen tip fajla. Dozvoljeni su samo .html i .htm fajlovi', 400, start)
+
+    if file_too_large(file):
+        return convert_rejected('too_large', too_large_message(), 413, start)
 
     try:
-        # Create temporary files for input and output
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as temp_html:
-            # Read and save uploaded HTML
-            html_content = file.read().decode('utf-8')
-            temp_html.write(html_content)
-            temp_html_path = temp_html.name
+        sniff_upload(file)
+    except UnsupportedFormatError:
+        return convert_rejected('unsupported_format', UNSUPPORTED_FORMAT, 415, start)
 
-        # Create temp file for XML output
-        temp_xml_fd, temp_xml_path = tempfile.mkstemp(suffix='.xml')
-        os.close(temp_xml_fd)
+    output_format = request.values.get('format', 'xml')
+    if output_format not in OUTPUT_FORMATS:
+        return convert_rejected(
+            'bad_format', f"Nepoznat format. Dozvoljeni su: {', '.join(OUTPUT_FORMATS)}", 400, start)
 
-        try:
-            # Convert HTML to XML
-            with open(temp_html_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-
-            # Parse HTML and generate XML
-            statement = BankStatement().parse_html(html_content)
-            xml_root = statement.to_ibank_xml()
-
-            # Convert to pretty XML string
-            xml_string = tostring(xml_root, encoding='unicode')
-            dom = minidom.parseString(xml_string)
-            pretty_xml = dom.toprettyxml(indent='  ')
-            pretty_xml = '\n'.join([line for line in pretty_xml.split('\n') if line.strip()])
-
-            # Write XML to temp file
-            with open(temp_xml_path, 'w', encoding='utf-8') as f:
-                f.write(pretty_xml)
-
-            # Generate output filename
-            original_filename = secure_filename(file.filename)
-            output_filename = original_filename.rsplit('.', 1)[0] + '.xml'
-
-            # Send file
-            response = send_file(
-                temp_xml_path,
-                mimetype='application/xml',
-                as_attachment=True,
-                download_name=output_filename
+    # Generate output filename
+    original_filename = secure_filename(file.filename)
+    output_filename = original_filename.rsplit('.', 1)[0] + OUTPUT_FORMATS[output_format][1]
+
+    try:
+        size = upload_size(file)
+        INPUT_BYTES.observe(size)
+        backend = parse_backend(size)
+
+        if output_format != 'xml':
+            # Flat formats are streamed row by row and not cached
+            statement = parse_statement(file.stream, backend, html_only=True,
+                                        executor=parse_executor(size))
+            record_statement(statement)
+            CONVERT_SECONDS.observe(time.perf_counter() - start, outcome='stream')
+            return Response(
+                iter_output(statement, output_format),
+                mimetype=OUTPUT_FORMATS[output_format][2],
+                headers={'Content-Disposition': f'attachment; filename={output_filename}'}
             )
 
-            # Schedule cleanup after response is sent
-            @response.call_on_close
-            def cleanup():
+        # Serve repeated uploads straight from the cache
+        key = cache_key(file.stream, CONVERTER_VERSION)
+        cache = get_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            CONVERT_SECONDS.observe(time.perf_counter() - start, outcome='hit')
+            response = send_xml(cached, output_filename, 'HIT')
+            response.headers['X-Conversion-Id'] = key
+            return response
+
+        # Parse the upload in chunks and generate XML in memory
+        statement, xml_text = convert_statement(file.stream, backend, html_only=True,
+                                                executor=parse_executor(size))
+        xml_bytes = xml_text.encode('utf-8')
+        cache_statement(key, xml_bytes, statement)
+        record_statement(statement)
+
+        CONVERT_SECONDS.observe(time.perf_counter() - start, outcome='miss')
+        remember_statement(key, statement)
+        response = send_xml(xml_bytes, output_filename, 'MISS')
+        response.headers['X-Conversion-Id'] = key
+        return response
+
+    except Exception as e:
+        error_msg, status = conversion_error(e)
+        return convert_rejected(type(e).__name__, error_msg, status, start)
+
+@app.route('/convert/batch', methods=['POST'])
+@admitted
+def convert_batch():
+    """Convert many uploaded files in parallel and stream back a ZIP."""
+    files = [f for f in request.files.getlist('html_file') if f.filename]
+    if not files:
+        return jsonify({'error': 'Niste odabrali fajl'}), 400
+
+    entries = []
+    used_names = set()
+    for index, file in enumerate(files):
+        entry = {'file': file.filename, 'status': 'error'}
+        entries.append(entry)
+        if not allowed_file(file.filename):
+            entry['error'] = 'Nedozvoljen tip fajla. Dozvoljeni su samo .html i .htm fajlovi'
+        elif file_too_large(file):
+            entry['error'] = too_large_message()
+        elif not sniffs_as_html(file):
+            entry['error'] = UNSUPPORTED_FORMAT
+        else:
+            output_name = secure_filename(file.filename).rsplit('.', 1)[0] + '.xml'
+            entry['output'] = unique_name(output_name, used_names)
+            entry['data'] = file.read()
+
+    cache = get_cache()
+    cached = []
+    futures = {}
+    for entry in entries:
+        if 'data' not in entry:
+            continue
+        data = entry.pop('data')
+        key = cache_key(data, CONVERTER_VERSION)
+        xml_bytes = cache.get(key)
+        if xml_bytes is not None:
+            entry['status'] = 'ok'
+            entry['cached'] = True
+            cached.append((entry, xml_bytes))
+        else:
+            futures[get_executor().submit(convert_upload, data)] = (entry, key)
+
+    def generate():
+        buffer = _ZipStream()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for entry, xml_bytes in cached:
+                archive.writestr(entry['output'], xml_bytes)
+                yield buffer.pop()
+
+            for future in as_completed(futures):
+                entry, key = futures[future]
                 try:
-                    os.unlink(temp_html_path)
-                    os.unlink(temp_xml_path)
-                except:
-                    pass
+                    xml_bytes, summary = future.result()
+                except Exception as e:
+                    entry['error'] = conversion_error(e)[0]
+                    del entry['output']
+                    continue
+                cache.put(key, xml_bytes)
+                entry['status'] = 'ok'
+                entry.update(summary)
+                archive.writestr(entry['output'], xml_bytes)
+                yield buffer.pop()
 
-            return response
+            converted = sum(1 for entry in entries if entry['status'] == 'ok')
+            manifest = {
+                'converted': converted,
+                'failed': len(entries) - converted,
+                'files': entries,
+            }
+            # Stored uncompressed so the browser can read it without inflating.
+            archive.writestr('manifest.json',
+                             json.dumps(manifest, ensure_ascii=False, indent=2),
+                             compress_type=zipfile.ZIP_STORED)
+        yield buffer.pop()
+
+    return Response(
+        generate(),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=izvodi_xml.zip'}
+    )
 
-        except Exception as e:
-            # Clean up temp files on error
+@app.route('/convert/archive', methods=['POST'])
+@admitted
+def convert_archive():
+    """Convert the statements in an uploaded ZIP or tar archive and stream back a ZIP.
+
+    Members are read from the upload one at a time, without extracting it,
+    and at most ARCHIVE_WINDOW of them are held while the pool converts.
+    """
+    file = request.files.get('archive')
+    if not file or not file.filename:
+        return jsonify({'error': 'Niste odabrali fajl'}), 400
+    if not is_archive(file.filename):
+        return jsonify({'error': 'Nedozvoljen tip fajla. Dozvoljene su .zip, .tar, .tar.gz i .tgz arhive'}), 400
+
+    members = iter_archive_members(file.stream, app.config['MAX_FILE_SIZE'])
+    try:
+        first = next(members, None)
+    except (UnsupportedFormatError, zipfile.BadZipFile, tarfile.TarError, EOFError, OSError):
+        return jsonify({'error': 'Neispravna arhiva. Očekuje se ZIP ili TAR arhiva'}), 400
+    if first is None:
+        return jsonify({'error': 'Arhiva ne sadrži HTML izvode'}), 400
+
+    cache = get_cache()
+    window = app.config['ARCHIVE_WINDOW']
+
+    def generate():
+        buffer = _ZipStream()
+        entries = []
+        used_names = {'manifest.json'}
+        # (entry, cache key, future) in archive order; future is None for rejected members
+        pending = deque()
+
+        def submit(name, data):
+            entry = {'file': name, 'status': 'error'}
+            entries.append(entry)
+            if data is None:
+                entry['error'] = too_large_message()
+                pending.append((entry, None, None))
+                return
+            key = cache_key(data, CONVERTER_VERSION)
+            xml_bytes = cache.get(key)
+            if xml_bytes is not None:
+                entry['cached'] = True
+                future = Future()
+                future.set_result((xml_bytes, {}))
+                pending.append((entry, None, future))
+            else:
+                pending.append((entry, key, get_executor().submit(convert_upload, data)))
+
+        def drain(limit):
+            while len(pending) > limit:
+                entry, key, future = pending.popleft()
+                if future is None:
+                    continue
+                try:
+                    xml_bytes, summary = future.result()
+                except Exception as e:
+                    entry['error'] = conversion_error(e)[0]
+                    continue
+                if key is not None:
+                    cache.put(key, xml_bytes)
+                entry['status'] = 'ok'
+                entry.update(summary)
+                entry['output'] = archive_output_name(entry['file'], '.xml', used_names)
+                archive.writestr(entry['output'], xml_bytes)
+                yield buffer.pop()
+
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
             try:
-                os.unlink(temp_html_path)
-                os.unlink(temp_xml_path)
-            except:
-                pass
-            raise e
+                for name, data in itertools.chain([first], members):
+                    submit(name, data)
+                    yield from drain(window)
+            except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError):
+                # A truncated tar is only noticed while reading it
+                entries.append({'file': file.filename, 'status': 'error',
+                                'error': 'Arhiva je oštećena, ostali fajlovi nisu pročitani'})
+            yield from drain(0)
 
-    except Exception as e:
-        error_msg = str(e)
-        if 'PREGLED SVIH VAŠIH TRANSAKCIJA' in error_msg or 'No transactions' in error_msg:
-            return jsonify({'error': 'HTML fajl ne sadrži validne transakcije'}), 400
+            converted = sum(1 for entry in entries if entry['status'] == 'ok')
+            manifest = {
+                'archive': file.filename,
+                'converted': converted,
+                'failed': len(entries) - converted,
+                'files': entries,
+            }
+            archive.writestr('manifest.json',
+                             json.dumps(manifest, ensure_ascii=False, indent=2),
+                             compress_type=zipfile.ZIP_STORED)
+        yield buffer.pop()
+
+    output_name = secure_filename(file.filename).split('.', 1)[0] or 'izvodi'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={output_name}_xml.zip'}
+    )
+
+@app.route('/convert/consolidate', methods=['POST'])
+@admitted
+def convert_consolidate():
+    """Merge many statements into one deduplicated XML per account.
+
+    A single account is returned as XML, several accounts as a ZIP with one
+    XML per account and a manifest.json.
+    """
+    files = [f for f in request.files.getlist('html_file') if f.filename]
+    if not files:
+        return jsonify({'error': 'Niste odabrali fajl'}), 400
+
+    errors = []
+    uploads = []
+    for file in files:
+        if not allowed_file(file.filename):
+            errors.append({'file': file.filename,
+                           'error': 'Nedozvoljen tip fajla. Dozvoljeni su samo .html i .htm fajlovi'})
+        elif file_too_large(file):
+            errors.append({'file': file.filename, 'error': too_large_message()})
+        elif not sniffs_as_html(file):
+            errors.append({'file': file.filename, 'error': UNSUPPORTED_FORMAT})
         else:
-            return jsonify({'error': f'Greška pri konverziji: {error_msg}'}), 500
+            uploads.append((file.filename, file.read()))
+
+    statements = []
+    if not errors:
+        futures = {get_executor().submit(parse_upload, data): name for name, data in uploads}
+        for future in as_completed(futures):
+            try:
+                statements.append(future.result())
+            except Exception as e:
+                errors.append({'file': futures[future], 'error': conversion_error(e)[0]})
+    if errors:
+        # A partial consolidation would silently miss transactions
+        return jsonify({'error': 'Izvodi nisu spojeni', 'files': errors}), 400
+
+    results = consolidate_statements(statements)
+    for statement, info in results:
+        info['output'] = consolidated_filename(info)
+
+    if len(results) == 1:
+        statement, info = results[0]
+        xml_bytes = ''.join(iter_pretty_xml(statement.to_ibank_xml())).encode('utf-8')
+        response = send_xml(xml_bytes, info['output'])
+        response.headers['X-Consolidation'] = json.dumps(info)
+        return response
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for statement, info in results:
+            archive.writestr(info['output'], ''.join(iter_pretty_xml(statement.to_ibank_xml())))
+        archive.writestr('manifest.json',
+                         json.dumps({'accounts': [info for _, info in results]},
+                                    ensure_ascii=False, indent=2),
+                         compress_type=zipfile.ZIP_STORED)
+    buffer.seek(0)
+    return send_file(buffer, mimetype='application/zip', as_attachment=True,
+                     download_name='izvodi_spojeni.zip')
+
+@app.route('/statements', methods=['POST'])
+@admitted
+def create_statement():
+    """Load an HTML statement or iBank XML for the viewer and return its summary."""
+    file = request.files.get('file') or request.files.get('html_file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'Niste odabrali fajl'}), 400
+
+    extension = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+    if extension not in ALLOWED_EXTENSIONS and extension != 'xml':
+        return jsonify({'error': 'Nedozvoljen tip fajla. Dozvoljeni su .html, .htm i .xml fajlovi'}), 400
+    if file_too_large(file):
+        return jsonify({'error': too_large_message()}), 413
+
+    try:
+        fmt = sniff_upload(file, html_only=False)
+    except UnsupportedFormatError:
+        return jsonify({'error': 'Nepodržan format fajla. Očekuje se Erste Bank HTML izvod '
+                                 'ili iBank XML'}), 415
+
+    try:
+        if not fmt.html:
+            data = file.read()
+            statement_id = cache_key(data, 'ibank-xml')
+            statement = read_ibank_xml(io.BytesIO(data))
+            get_cache().put(statement_id, data)
+        else:
+            statement_id = cache_key(file.stream, CONVERTER_VERSION)
+            statement, xml_text = convert_statement(
+                file.stream, parse_backend(upload_size(file)), html_only=True)
+            cache_statement(statement_id, xml_text.encode('utf-8'), statement)
+    except Exception as e:
+        error_msg, status = conversion_error(e)
+        return jsonify({'error': error_msg}), status
+
+    remember_statement(statement_id, statement)
+    return jsonify(statement_summary(statement_id, statement)), 201
+
+@app.route('/statements/<statement_id>')
+def get_statement(statement_id):
+    """Summary of a loaded statement or cached conversion."""
+    statement = find_statement(statement_id)
+    if statement is None:
+        return jsonify({'error': 'Izvod nije pronađen'}), 404
+    return jsonify(statement_summary(statement_id, statement)), 200
+
+@app.route('/statements/<statement_id>/transactions')
+def get_statement_transactions(statement_id):
+    """One page of a statement's transactions, optionally filtered.
+
+    Query arguments: page, per_page, benefit (credit/debit), q (text),
+    date_from / date_to (YYYY-MM-DD), min_amount / max_amount.
+    """
+    statement = find_statement(statement_id)
+    if statement is None:
+        return jsonify({'error': 'Izvod nije pronađen'}), 404
+
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', app.config['PAGE_SIZE'])), 1),
+                       app.config['MAX_PAGE_SIZE'])
+        min_amount = parse_amount_arg('min_amount')
+        max_amount = parse_amount_arg('max_amount')
+    except ValueError:
+        return jsonify({'error': 'Neispravan parametar upita'}), 400
+
+    table = statement.transactions
+    matches = table.find(
+        benefit=request.args.get('benefit') or None,
+        text=request.args.get('q') or None,
+        date_from=request.args.get('date_from') or None,
+        date_to=request.args.get('date_to') or None,
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
+    columns = table.columns
+    rows = []
+    for i in matches[(page - 1) * per_page:page * per_page]:
+        row = {field: columns[field][i] for field in ROW_FIELDS if field != 'trnamt'}
+        row['trnamt'] = format_minor(table.amounts[i])
+        rows.append(row)
+
+    return jsonify({
+        'page': page,
+        'per_page': per_page,
+        'total': len(matches),
+        'pages': (len(matches) + per_page - 1) // per_page,
+        'transactions': rows,
+    }), 200
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Submit a file for asynchronous conversion and return a job id."""
+    if 'html_file' not in request.files:
+        return jsonify({'error': 'Fajl nije pronađen'}), 400
+
+    file = request.files['html_file']
+
+    if file.filename == '':
+        return jsonify({'error': 'Niste odabrali fajl'}), 400
+
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Nedozvoljen tip fajla. Dozvoljeni su samo .html i .htm fajlovi'}), 400
+
+    if file_too_large(file):
+        return jsonify({'error': too_large_message()}), 413
+
+    if not sniffs_as_html(file):
+        return jsonify({'error': UNSUPPORTED_FORMAT}), 415
+
+    sweep_jobs()
+    output_filename = secure_filename(file.filename).rsplit('.', 1)[0] + '.xml'
+    data = file.read()
+    key = cache_key(data, CONVERTER_VERSION)
+    cached = get_cache().get(key)
+
+    if cached is None:
+        with _job_lock:
+            busy = len(_job_futures)
+        if busy >= app.config['JOB_QUEUE_LIMIT']:
+            return overloaded(5)
+
+    meta = get_jobs().create(file.filename, output_filename, data, result=cached)
+    if cached is None:
+        submit_job(meta['id'], key)
+
+    response = jsonify(job_status(meta))
+    response.headers['Location'] = f"/jobs/{meta['id']}"
+    return response, 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Poll the state and progress of a conversion job."""
+    sweep_jobs()
+    meta = get_jobs().get(job_id)
+    if meta is None:
+        return jsonify({'error': 'Posao nije pronađen ili je istekao'}), 404
+    return jsonify(job_status(meta)), 200
+
+@app.route('/jobs/<job_id>/result')
+def get_job_result(job_id):
+    """Download the XML produced by a finished job."""
+    meta = get_jobs().get(job_id)
+    if meta is None:
+        return jsonify({'error': 'Posao nije pronađen ili je istekao'}), 404
+    if meta['state'] == FAILED:
+        error_msg, status = conversion_error(Exception(meta.get('error', '')))
+        return jsonify({'error': error_msg}), status
+    if meta['state'] != DONE:
+        return jsonify({'error': 'Konverzija još nije završena', 'state': meta['state'],
+                        'progress': meta['progress']}), 409
+    return send_file(
+        get_jobs().result_path(job_id),
+        mimetype='application/xml',
+        as_attachment=True,
+        download_name=meta['output']
+    )
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Conversion cache hit/miss counters."""
+    return jsonify(get_cache().stats()), 200
+
+@app.route('/jobs/stats')
+def jobs_stats():
+    """Jobs per state across all workers, and this worker's pool queue."""
+    with _job_lock:
+        busy = len(_job_futures)
+    return jsonify({
+        'states': get_jobs().counts(),
+        'worker_busy': busy,
+        'worker_queue_limit': app.config['JOB_QUEUE_LIMIT'],
+    }), 200
+
+@app.route('/admission/stats')
+def admission_stats():
+    """Conversion slots, wait queue depth and admission counters."""
+    return jsonify(get_admission().stats()), 200
+
+@app.teardown_request
+def publish_metrics(error=None):
+    """Share this worker's metrics with the others (throttled)."""
+    metrics.write_snapshot()
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Conversion metrics in the Prometheus text format."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def warm_up():
+    """Import and exercise the converter once so workers start hot.
+
+    Under gunicorn this runs in the master before workers are forked, so
+    every worker inherits the loaded modules, compiled patterns and the
+    pages read and compressed by ``get_assets().load()``.
+    """
+    global _ready
+    for backend in ('bs4', 'stream'):
+        convert_statement(WARMUP_HTML.encode('utf-8'), backend, html_only=True)
+    get_assets().load()
+    _ready = True
 
 @app.route('/health')
 def health():
-    """Health check endpoint."""
+    """Health check endpoint (liveness)."""
+    return jsonify({'status': 'ok', 'ready': _ready}), 200
+
+@app.route('/health/live')
+def health_live():
+    """Liveness probe: the process is up and serving requests."""
     return jsonify({'status': 'ok'}), 200
 
+@app.route('/health/ready')
+def health_ready():
+    """Readiness probe: the converter is loaded and warmed up."""
+    if not _ready:
+        return jsonify({'status': 'starting'}), 503
+    return jsonify({'status': 'ready', 'pid': os.getpid()}), 200
+
 if __name__ == '__main__':
-    # Run the app
+    # Run the app (development server; use gunicorn -c gunicorn.conf.py in production)
+    warm_up()
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -3,6 +3,14 @@
 # Batch HTML to iBank XML Converter
 # Converts all Erste Bank HTML statements to XML format
 #
+# Thin wrapper around the native batch mode of convert_html_to_xml.py,
+# which converts in parallel and skips unchanged files. Extra arguments
+# are passed through, e.g.:
+#   ./batch_convert_all.sh --jobs 4 --report izvestaj.json
+#
+# An archive of statements is converted directly, without unpacking:
+#   ./batch_convert_all.sh izvodi.zip [izvodi_xml.zip] --jobs 4
+#
 
 echo "=========================================="
 echo "HTML → iBank XML Batch Converter"
@@ -21,33 +29,11 @@ if [ ! -f "convert_html_to_xml.py" ]; then
     exit 1
 fi
 
-count=0
-failed=0
+shopt -s nocasematch
+case "$1" in
+    *.zip|*.tar|*.tar.gz|*.tgz)
+        exec python3 convert_html_to_xml.py "$@"
+        ;;
+esac
 
-# Process all HTML statement files
-for file in "Dinarski izvod"*.html "Devizni izvod"*.html; do
-    if [ -f "$file" ]; then
-        echo "Converting: $file"
-        if python3 convert_html_to_xml.py "$file"; then
-            count=$((count + 1))
-            echo ""
-        else
-            echo "✗ Failed!"
-            failed=$((failed + 1))
-            echo ""
-        fi
-    fi
-done
-
-if [ $count -eq 0 ] && [ $failed -eq 0 ]; then
-    echo "No HTML statement files found."
-    echo "Looking for: 'Dinarski izvod*.html' or 'Devizni izvod*.html'"
-else
-    echo "=========================================="
-    echo "✓ Conversion complete"
-    echo "  Converted: $count"
-    if [ $failed -gt 0 ]; then
-        echo "  Failed: $failed"
-    fi
-    echo "=========================================="
-fi
+exec python3 convert_html_to_xml.py --batch . "$@"
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the statement converter.
+
+Times each conversion stage on synthetic statements of increasing size:
+
+    parse_html   HTML -> BankStatement
+    to_xml       BankStatement -> ElementTree (to_ibank_xml)
+    pretty       ElementTree -> pretty-printed XML text
+    cli          convert() on a file, as the CLI does
+    endpoint     POST /convert through the Flask test client
+
+With --jobs N, parse_html and cli decode the rows (and cli also renders
+the XML) of large statements in a pool of N processes.
+
+Results can be saved as a JSON baseline and later runs compared against
+it; any stage slower than the baseline by more than --threshold fails
+the run with exit code 1.
+
+    python benchmarks/bench_converter.py --save benchmarks/baseline.json
+    python benchmarks/bench_converter.py --compare benchmarks/baseline.json
+"""
+
+import argparse
+import atexit
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from convert_html_to_xml import BankStatement, CONVERTER_VERSION, convert, iter_pretty_xml
+from statement_generator import generate_statement
+
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+STAGES = ('parse_html', 'to_xml', 'pretty', 'cli', 'endpoint')
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+
+def time_call(func, repeat):
+    """Run ``func`` ``repeat`` times and return the timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def load_app():
+    """Return the Flask app module configured for benchmarking, or None."""
+    try:
+        import app as app_module
+    except ImportError:
+        return None
+    app_module.app.config['MAX_CONTENT_LENGTH'] = None
+    app_module.app.config['MAX_FILE_SIZE'] = float('inf')
+    # Memory-only cache and private job store: nothing carries over from
+    # earlier runs or from a server using the default directories
+    app_module.app.config['CACHE_DIR'] = ''
+    jobs_dir = tempfile.mkdtemp(prefix='izvodi-bench-jobs-')
+    atexit.register(shutil.rmtree, jobs_dir, ignore_errors=True)
+    app_module.app.config['JOBS_DIR'] = jobs_dir
+    app_module._cache = app_module._jobs = None
+    return app_module
+
+
+def bench_size(rows, kind, backend, layout, repeat, stages, app_module, executor=None, jobs=None):
+    """Benchmark all requested stages for one statement size."""
+    if kind == 'devizni':
+        html = generate_statement(foreign=rows, seed=rows)
+    elif kind == 'mixed':
+        html = generate_statement(domestic=rows - rows // 2, foreign=rows // 2, seed=rows)
+    else:
+        html = generate_statement(domestic=rows, seed=rows)
+    data = html.encode('utf-8')
+
+    statement = BankStatement().parse_html(html, backend, layout)
+    if len(statement.transactions) != rows:
+        raise RuntimeError(f"Očekivano {rows} transakcija, parsirano {len(statement.transactions)}")
+    root = statement.to_ibank_xml()
+
+    results = {}
+
+    def record(stage, func):
+        if stage not in stages:
+            return
+        timings = time_call(func, repeat)
+        results[stage] = {
+            'median': statistics.median(timings),
+            'min': min(timings),
+            'rows_per_sec': rows / statistics.median(timings) if rows else None,
+        }
+
+    record('parse_html', lambda: BankStatement().parse_html(html, backend, layout, executor))
+    record('to_xml', statement.to_ibank_xml)
+    record('pretty', lambda: ''.join(iter_pretty_xml(root)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        html_path = Path(tmp) / 'Dinarski izvod#1.html'
+        html_path.write_bytes(data)
+        xml_path = Path(tmp) / 'out.xml'
+
+        def run_cli():
+            with contextlib.redirect_stdout(io.StringIO()):
+                convert(html_path, xml_path, backend, layout=layout, workers=jobs)
+        record('cli', run_cli)
+
+    if app_module is not None and 'endpoint' in stages:
+        client = app_module.app.test_client()
+
+        def post():
+            # A fresh memory-only cache per request keeps every upload a miss
+            app_module._cache = None
+            response = client.post('/convert', data={
+                'html_file': (io.BytesIO(data), 'Dinarski izvod#1.html'),
+            }, content_type='multipart/form-data')
+            if response.status_code != 200:
+                raise RuntimeError(f"/convert vratio {response.status_code}: {response.get_data(as_text=True)}")
+        record('endpoint', post)
+
+    return {'bytes': len(data), 'stages': results}
+
+
+def compare(current, baseline, threshold):
+    """Return a list of regressions of ``current`` against ``baseline``."""
+    regressions = []
+    for size, entry in current['results'].items():
+        base_entry = baseline.get('results', {}).get(size)
+        if not base_entry:
+            continue
+        for stage, timing in entry['stages'].items():
+            base = base_entry['stages'].get(stage)
+            if not base or not base['median']:
+                continue
+            ratio = timing['median'] / base['median']
+            if ratio > 1 + threshold:
+                regressions.append((size, stage, base['median'], timing['median'], ratio))
+    return regressions
+
+
+def print_table(report):
+    """Print a human-readable summary of a benchmark report."""
+    print(f"{'redova':>8} {'faza':<12} {'medijana':>12} {'min':>12} {'redova/s':>12}")
+    for size, entry in report['results'].items():
+        for stage, timing in entry['stages'].items():
+            rate = f"{timing['rows_per_sec']:,.0f}" if timing['rows_per_sec'] else '-'
+            print(f"{size:>8} {stage:<12} {timing['median'] * 1000:>10.2f}ms "
+                  f"{timing['min'] * 1000:>10.2f}ms {rate:>12}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark konverzije izvoda")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="broj transakcija po izvodu (podrazumevano: 10 1000 10000 100000)")
+    parser.add_argument('--kind', choices=('dinarski', 'devizni', 'mixed'), default='dinarski',
+                        help="vrsta sintetičkog izvoda")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--backend', choices=('bs4', 'stream'), default='bs4')
+    parser.add_argument('--layout', choices=('table', 'spans'), default='table')
+    parser.add_argument('--repeat', type=int, default=3, help="broj ponavljanja po fazi")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="obrada redova i XML-a velikih izvoda u N procesa")
+    parser.add_argument('--save', metavar='PATH', nargs='?', const=str(DEFAULT_BASELINE),
+                        help="sačuvaj rezultate kao baseline")
+    parser.add_argument('--compare', metavar='PATH', nargs='?', const=str(DEFAULT_BASELINE),
+                        help="uporedi sa sačuvanim baseline-om")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="dozvoljeno usporenje u odnosu na baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    app_module = load_app() if 'endpoint' in args.stages else None
+    if 'endpoint' in args.stages and app_module is None:
+        print("Flask nije instaliran, preskačem endpoint fazu", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'converter_version': CONVERTER_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'kind': args.kind,
+            'backend': args.backend,
+            'layout': args.layout,
+            'jobs': args.jobs,
+            'repeat': args.repeat,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {},
+    }
+    executor = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs and args.jobs > 1 else None
+    try:
+        for rows in args.sizes:
+            report['results'][str(rows)] = bench_size(
+                rows, args.kind, args.backend, args.layout, args.repeat, args.stages, app_module,
+                executor, args.jobs)
+            print(f"✓ {rows} transakcija", file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    print_table(report)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline sačuvan: {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for field in ('kind', 'backend', 'layout', 'jobs'):
+            if baseline['meta'].get(field) != report['meta'][field]:
+                print(f"Upozorenje: baseline je snimljen sa {field}={baseline['meta'].get(field)}",
+                      file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        for size, stage, before, after, ratio in regressions:
+            print(f"✗ {stage} @ {size}: {before * 1000:.2f}ms -> {after * 1000:.2f}ms ({ratio:.2f}x)")
+        if regressions:
+            print(f"Regresija: {len(regressions)} faza sporije od praga {args.threshold:.0%}")
+            sys.exit(1)
+        print("Bez regresija u odnosu na baseline")
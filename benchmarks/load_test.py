@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Load test for the web service.
+
+Starts the app locally (gunicorn with gunicorn.conf.py, or the Flask
+development server), drives POST /convert with synthetic statements and
+GET /health from a number of concurrent clients, and reports per request
+kind:
+
+    requests, throughput   completed requests and requests per second
+    p50/p95/p99            latency percentiles in milliseconds
+    error_rate             share of failed requests (503s counted apart)
+
+plus the peak RSS of every server process (master and workers), read from
+/proc. The JSON report can be saved and later runs compared against it;
+a drop in throughput or a rise in p95 latency beyond --threshold fails
+the run with exit code 1.
+
+    python benchmarks/load_test.py --concurrency 16 --duration 30 --save
+    python benchmarks/load_test.py --workers 2 --threads 8 --compare
+    python benchmarks/load_test.py --url http://localhost:5000 --mix convert=1
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from convert_html_to_xml import CONVERTER_VERSION
+from statement_generator import generate_statement
+
+DEFAULT_SIZES = (10, 1000)
+DEFAULT_MIX = 'convert=9,health=1'
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'load_baseline.json'
+BOUNDARY = 'izvodi-load-test'
+RSS_INTERVAL = 0.2
+
+
+def parse_mix(text):
+    """Parse ``convert=9,health=1`` into ``[('convert', 9.0), ('health', 1.0)]``."""
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('convert', 'health'):
+            raise argparse.ArgumentTypeError(f"Nepoznata vrsta zahteva: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def multipart_body(data, filename):
+    """Encode one ``html_file`` upload as a multipart/form-data body."""
+    return (
+        f'--{BOUNDARY}\r\n'
+        f'Content-Disposition: form-data; name="html_file"; filename="{filename}"\r\n'
+        'Content-Type: text/html\r\n\r\n'
+    ).encode('utf-8') + data + f'\r\n--{BOUNDARY}--\r\n'.encode('ascii')
+
+
+def percentile(sorted_values, q):
+    """Linearly interpolated percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, port, workers, threads, extra_env):
+    """Start the app in a subprocess and return the Popen object."""
+    env = dict(os.environ, BIND=f'127.0.0.1:{port}', WEB_THREADS=str(threads),
+               LOG_LEVEL='warning', ADMISSION_TRUST_FORWARDED='1')
+    env.update(extra_env)
+    if workers:
+        env['WEB_WORKERS'] = str(workers)
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                   '--access-logfile', '/dev/null', 'app:app']
+    else:
+        command = [sys.executable, '-c',
+                   'import app; app.warm_up(); '
+                   f'app.app.run(host="127.0.0.1", port={port}, threaded=True)']
+    # A file rather than a pipe, which a chatty server could fill and block on
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    process.log = log
+    return process
+
+
+def wait_ready(host, port, process=None, timeout=60):
+    """Poll /health/ready until the server answers 200."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            process.log.seek(0)
+            raise RuntimeError("Server se ugasio: " + process.log.read().decode(errors='replace'))
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/health/ready')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+            conn.close()
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server nije spreman posle {timeout}s")
+
+
+def process_tree(root_pid):
+    """Return ``root_pid`` and all of its descendants, from /proc."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # the command name may contain spaces; fields resume after ')'
+        ppid = int(stat[stat.rindex(b')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    pids = [root_pid]
+    for pid in pids:
+        pids.extend(children.get(pid, ()))
+    return pids
+
+
+def peak_rss_kb(pid):
+    """Peak resident set size (VmHWM) of a process in KiB, or None."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler(threading.Thread):
+    """Track the peak RSS of every process in a server's process tree.
+
+    Workers recycled during the run (max_requests) keep the peak they had
+    reached when last sampled.
+    """
+
+    def __init__(self, root_pid):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.peaks = {}
+        self.stopped = threading.Event()
+
+    def sample(self):
+        for pid in process_tree(self.root_pid):
+            rss = peak_rss_kb(pid)
+            if rss is not None and rss > self.peaks.get(pid, 0):
+                self.peaks[pid] = rss
+
+    def run(self):
+        while not self.stopped.wait(RSS_INTERVAL):
+            self.sample()
+
+    def report(self):
+        self.sample()
+        workers = {str(pid): round(kb / 1024, 1) for pid, kb in sorted(self.peaks.items())}
+        return {
+            'master_mb': workers.pop(str(self.root_pid), None),
+            'workers_mb': workers,
+            'max_worker_mb': max(workers.values(), default=None),
+        }
+
+
+class LoadClient(threading.Thread):
+    """One closed-loop client sending requests over a keep-alive connection."""
+
+    def __init__(self, host, port, mix, bodies, cache_hit_ratio, deadline, budget, seed):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.mix = mix
+        self.bodies = bodies
+        self.cache_hit_ratio = cache_hit_ratio
+        self.deadline = deadline
+        self.budget = budget
+        self.rng = random.Random(seed)
+        self.seed = seed
+        # Each client looks like a separate user to per-client admission limits
+        self.address = f'10.{seed // 65536 % 256}.{seed // 256 % 256}.{seed % 256}'
+        self.samples = []
+
+    def next_request(self, counter):
+        """Pick a request from the mix: ``(key, method, path, body, headers)``."""
+        kind = self.rng.choices([name for name, _ in self.mix],
+                                [weight for _, weight in self.mix])[0]
+        headers = {'X-Forwarded-For': self.address}
+        if kind == 'health':
+            return 'health', 'GET', '/health', None, headers
+        size, data = self.rng.choice(self.bodies)
+        if self.rng.random() >= self.cache_hit_ratio:
+            # A unique trailing comment makes every upload a cache miss
+            data += f'<!-- {self.seed}.{counter} -->'.encode('ascii')
+        headers['Content-Type'] = f'multipart/form-data; boundary={BOUNDARY}'
+        body = multipart_body(data, f'Dinarski izvod#{size}.html')
+        return f'convert/{size}', 'POST', '/convert', body, headers
+
+    def run(self):
+        conn = None
+        counter = 0
+        while time.monotonic() < self.deadline and self.budget.take():
+            counter += 1
+            key, method, path, body, headers = self.next_request(counter)
+            if conn is None:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                status = None
+                conn.close()
+                conn = None
+            self.samples.append((key, status, time.perf_counter() - start))
+        if conn is not None:
+            conn.close()
+
+
+class Budget:
+    """Shared, thread-safe cap on the total number of requests (None: no cap)."""
+
+    def __init__(self, total):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def summarize(samples, elapsed):
+    """Aggregate ``(key, status, seconds)`` samples per request kind."""
+    groups = {}
+    for key, status, seconds in samples:
+        groups.setdefault(key, []).append((status, seconds))
+    if samples:
+        groups['all'] = [(status, seconds) for _, status, seconds in samples]
+
+    results = {}
+    for key, entries in sorted(groups.items()):
+        latencies = sorted(seconds for _, seconds in entries)
+        ok = sum(1 for status, _ in entries if status is not None and status < 400)
+        rejected = sum(1 for status, _ in entries if status == 503)
+        errors = len(entries) - ok - rejected
+        results[key] = {
+            'requests': len(entries),
+            'ok': ok,
+            'rejected_503': rejected,
+            'errors': errors,
+            'error_rate': errors / len(entries) if entries else 0.0,
+            'throughput': ok / elapsed if elapsed else None,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
+    return results
+
+
+def run_load(host, port, args):
+    """Run the clients and return ``(samples, elapsed seconds)``."""
+    bodies = []
+    for rows in args.sizes:
+        html = generate_statement(domestic=rows, seed=rows)
+        bodies.append((rows, html.encode('utf-8')))
+
+    # Warm every size once so the first timed requests are not outliers
+    warm = LoadClient(host, port, [('convert', 1)], bodies, 0.0,
+                      time.monotonic() + 300, Budget(len(bodies) * 2), seed=-1)
+    warm.run()
+
+    start = time.monotonic()
+    deadline = start + args.duration if args.duration else float('inf')
+    budget = Budget(args.requests)
+    clients = [LoadClient(host, port, args.mix, bodies, args.cache_hit_ratio,
+                          deadline, budget, seed=i)
+               for i in range(args.concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - start
+    return [sample for client in clients for sample in client.samples], elapsed
+
+
+def compare(current, baseline, threshold):
+    """Return a list of regressions of ``current`` against ``baseline``."""
+    regressions = []
+    for key, result in current['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if not base:
+            continue
+        if base['throughput'] and result['throughput'] is not None:
+            ratio = result['throughput'] / base['throughput']
+            if ratio < 1 - threshold:
+                regressions.append((key, 'throughput', base['throughput'], result['throughput'], ratio))
+        if base['p95_ms']:
+            ratio = result['p95_ms'] / base['p95_ms']
+            if ratio > 1 + threshold:
+                regressions.append((key, 'p95_ms', base['p95_ms'], result['p95_ms'], ratio))
+    return regressions
+
+
+def print_table(report):
+    """Print a human-readable summary of a load test report."""
+    print(f"{'zahtev':<16} {'broj':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'greške':>7} {'503':>5}")
+    for key, result in report['results'].items():
+        print(f"{key:<16} {result['requests']:>7} {result['throughput']:>8.1f} "
+              f"{result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms "
+              f"{result['error_rate']:>7.1%} {result['rejected_503']:>5}")
+    rss = report.get('rss')
+    if rss:
+        workers = ', '.join(f'{mb:.0f}' for mb in rss['workers_mb'].values())
+        print(f"Najveći RSS: master {rss['master_mb']} MB, workeri [{workers}] MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Test opterećenja web servisa")
+    parser.add_argument('--url', help="već pokrenut server (bez merenja RSS-a osim uz --pid)")
+    parser.add_argument('--pid', type=int, help="pid master procesa servera zadatog sa --url")
+    parser.add_argument('--server', choices=('gunicorn', 'flask'), default='gunicorn',
+                        help="kako se server pokreće lokalno (podrazumevano: gunicorn)")
+    parser.add_argument('--workers', type=int, help="WEB_WORKERS za gunicorn")
+    parser.add_argument('--threads', type=int, default=8, help="WEB_THREADS za gunicorn")
+    parser.add_argument('--env', metavar='KEY=VALUE', action='append', default=[],
+                        type=lambda text: tuple(text.split('=', 1)),
+                        help="promenljiva okruženja za server, npr. ADMISSION_MAX_IN_FLIGHT=4")
+    parser.add_argument('--concurrency', type=int, default=8, help="broj istovremenih klijenata")
+    parser.add_argument('--duration', type=float, default=20, help="trajanje testa u sekundama")
+    parser.add_argument('--requests', type=int, help="ukupan broj zahteva (umesto trajanja)")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help="težine vrsta zahteva (podrazumevano: convert=9,health=1)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="broj transakcija u sintetičkim izvodima (podrazumevano: 10 1000)")
+    parser.add_argument('--cache-hit-ratio', type=float, default=0.0,
+                        help="udeo /convert zahteva sa već viđenim sadržajem (keš pogodak)")
+    parser.add_argument('--save', metavar='PATH', nargs='?', const=str(DEFAULT_BASELINE),
+                        help="sačuvaj izveštaj kao baseline")
+    parser.add_argument('--compare', metavar='PATH', nargs='?', const=str(DEFAULT_BASELINE),
+                        help="uporedi sa sačuvanim baseline-om")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="dozvoljen pad propusnosti / rast p95 (0.25 = 25%%)")
+    parser.add_argument('--json', action='store_true', help="ispiši ceo izveštaj kao JSON")
+    args = parser.parse_args()
+    if args.requests:
+        args.duration = 0
+
+    process = None
+    if args.url:
+        url = urllib.parse.urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        root_pid = args.pid
+    else:
+        host, port = '127.0.0.1', free_port()
+        process = start_server(args.server, port, args.workers, args.threads, dict(args.env))
+        root_pid = process.pid
+
+    sampler = None
+    try:
+        wait_ready(host, port, process)
+        if root_pid and os.path.isdir('/proc'):
+            sampler = RssSampler(root_pid)
+            sampler.start()
+        print(f"Opterećujem {host}:{port} ({args.concurrency} klijenata)...", file=sys.stderr)
+        samples, elapsed = run_load(host, port, args)
+    finally:
+        if sampler is not None:
+            sampler.stopped.set()
+        rss = sampler.report() if sampler is not None else None
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report = {
+        'meta': {
+            'converter_version': CONVERTER_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'server': 'external' if args.url else args.server,
+            'workers': args.workers,
+            'threads': args.threads,
+            'env': dict(args.env),
+            'concurrency': args.concurrency,
+            'duration': round(elapsed, 3),
+            'mix': dict(args.mix),
+            'sizes': args.sizes,
+            'cache_hit_ratio': args.cache_hit_ratio,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': summarize(samples, elapsed),
+        'rss': rss,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline sačuvan: {args.save}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for field in ('server', 'workers', 'threads', 'env', 'concurrency', 'mix', 'sizes'):
+            if baseline['meta'].get(field) != report['meta'][field]:
+                print(f"Upozorenje: baseline je snimljen sa {field}={baseline['meta'].get(field)}",
+                      file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        for key, metric, before, after, ratio in regressions:
+            print(f"✗ {key} {metric}: {before:.1f} -> {after:.1f} ({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            print(f"Regresija: {len(regressions)} merenja van praga {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+        print("Bez regresija u odnosu na baseline", file=sys.stderr)
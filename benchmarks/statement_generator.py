@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Synthetic Erste Bank statement generator.
+
+Produces "Dinarski izvod" / "Devizni izvod" HTML in the span layout that
+BankStatement expects, with a configurable number of domestic and FT
+foreign transactions. Output is deterministic for a given seed.
+
+    python benchmarks/statement_generator.py --domestic 1000 -o "Dinarski izvod#1.html"
+    python benchmarks/statement_generator.py --foreign 500 --currency EUR -o "Devizni izvod#1.html"
+"""
+
+import argparse
+import random
+import sys
+from html import escape
+
+PAYEES = [
+    'JAVNO PREDUZECE ELEKTROPRIVREDA SRBIJE', 'TELEKOM SRBIJA', 'POSTA SRBIJE',
+    'REPUBLIKA SRBIJA PORESKA UPRAVA', 'GRADSKA TOPLANA', 'ERSTE BANK AD NOVI SAD',
+]
+PURPOSES = [
+    'Uplata po fakturi br {n}', 'Naknada za vodjenje racuna', 'Porez na dohodak za {m}/2025',
+    'Placanje robe po racunu {n}', 'Zakup poslovnog prostora za {m}. mesec',
+    'Naknada za reizdavanje osnovne kartice', 'Prenos sredstava',
+]
+ORDERING_PARTIES = [
+    ('ACME SOFTWARE LLC', 'NEW YORK', 'US', 'CITIBANK N.A.'),
+    ('NORDIC DATA AB', 'STOCKHOLM', 'SE', 'SWEDBANK AB'),
+    ('ALPEN CONSULTING GMBH', 'WIEN', 'AT', 'RAIFFEISEN BANK INTERNATIONAL'),
+]
+
+
+def format_amount(minor):
+    """Format minor units in Serbian notation: 1.234,56"""
+    units = f"{minor // 100:,}".replace(',', '.')
+    return f"{units},{minor % 100:02d}"
+
+
+def _cells(values):
+    return '<tr>' + ''.join(f'<td><span class="txt">{escape(v)}</span></td>' if v else '<td></td>'
+                            for v in values) + '</tr>'
+
+
+def _domestic_row(rng, serial, day):
+    date = f"{day:02d}.10.2025"
+    n = rng.randint(1, 99999)
+    purpose = rng.choice(PURPOSES).format(n=n, m=rng.randint(1, 12))
+    if rng.random() < 0.8:
+        reference = f"FT25{rng.randint(100, 365)}{rng.choice('ABCDEFGHJK')}{n:05d}"
+        if rng.random() < 0.3:
+            reference = 'PBZ:PBO:' + reference
+    else:
+        reference = f"97-{n}"
+    amount = format_amount(rng.randint(100, 50000000))
+    debit = rng.random() < 0.6
+    values = [str(serial), date, date, purpose]
+    if rng.random() < 0.3:
+        values.append(rng.choice(PAYEES))
+    values.append(reference)
+    values += [amount, ''] if debit else ['', amount]
+    return _cells(values)
+
+
+def _foreign_row(rng, serial, day, currency):
+    date = f"{day:02d}.09.2025"
+    party, city, country, bank = rng.choice(ORDERING_PARTIES)
+    n = rng.randint(1, 99999)
+    minor = rng.randint(10000, 5000000)
+    amount = format_amount(minor)
+    rsd = format_amount(minor * 117)
+    block = (
+        f"FT25{rng.randint(100, 365)}{rng.choice('ABCDEFGHJK')}{n:05d}\n"
+        f"Priliv iz inostranstva\n"
+        f"Banka nalogodavca: {bank}\n"
+        f"Nalogodavac: 1/{party}, 2/{city} Zemlja: {country}\n"
+        f"Osnov: 101 Izvoz usluga RRN {n:08d}\n"
+        f"Opis: Invoice {n} Iznos: {amount} {currency}"
+    )
+    values = [str(serial), block, f"{date} {date}", f"{amount} {rsd}", currency, 'Kurs: 117,0000']
+    return _cells(values)
+
+
+def generate_statement(domestic=0, foreign=0, currency=None, seed=0, number=43):
+    """Return statement HTML with the requested number of transactions."""
+    rng = random.Random(seed)
+    if currency is None:
+        currency = 'EUR' if foreign and not domestic else 'RSD'
+    kind = 'Dinarski izvod' if currency == 'RSD' else 'Devizni izvod'
+    account = '340000001101901597' if currency == 'RSD' else '030000146059'
+
+    rows = []
+    serial = 0
+    for _ in range(domestic):
+        serial += 1
+        rows.append(_domestic_row(rng, serial % 1000 or 1, rng.randint(1, 28)))
+    for _ in range(foreign):
+        serial += 1
+        rows.append(_foreign_row(rng, serial % 1000 or 1, rng.randint(1, 28), currency))
+
+    header = [
+        ('ERSTE BANK AD NOVI SAD', None),
+        (f'Izvod broj i datum: {number}/22.10.2025', None),
+        (f'Platni račun broj: {account}', None),
+        ('IBAN: RS35340000001101901597', None),
+        (f'Valuta: {currency}', None),
+        ('PRIMER DOO BEOGRAD Adresa: Bulevar oslobođenja 1', None),
+        ('Početno stanje', f'250.000,00 {currency}'),
+        ('Krajnje stanje', f'263.952,69 {currency}'),
+        ('Ukupno na teret', f'1.500,00 {currency}'),
+        ('Ukupno u korist', f'15.452,69 {currency}'),
+    ]
+    header_rows = ''.join(
+        '<tr><td><span>{}</span></td>{}</tr>'.format(
+            escape(label), f'<td><span>{escape(value)}</span></td>' if value else '')
+        for label, value in header
+    )
+    columns = ['R.br.', 'Datum prijema', 'Datum izvršenja', 'Opis', 'Referenca', 'NA TERET', 'U KORIST']
+
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f'<title>{kind}</title><style>td {{ font-size: 8pt; }}</style></head><body>\n'
+        f'<table class="header">{header_rows}</table>\n'
+        '<table class="transactions">\n'
+        '<tr><td colspan="7"><span>PREGLED SVIH VAŠIH TRANSAKCIJA</span></td></tr>\n'
+        + _cells(columns) + '\n'
+        + '\n'.join(rows)
+        + '\n</table>\n<p><span>Hvala na poverenju.</span></p>\n</body></html>\n'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generator sintetičkih Erste izvoda")
+    parser.add_argument('--domestic', type=int, default=0, help="broj domaćih transakcija")
+    parser.add_argument('--foreign', type=int, default=0, help="broj deviznih (FT) transakcija")
+    parser.add_argument('--currency', help="valuta (podrazumevano RSD, ili EUR za devizni)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="izlazni HTML fajl (podrazumevano stdout)")
+    args = parser.parse_args()
+
+    html = generate_statement(args.domestic, args.foreign, args.currency, args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(html)
+    else:
+        sys.stdout.write(html)
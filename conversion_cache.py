@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of converted iBank XML documents.
+
+Entries are keyed by a hash of the uploaded HTML bytes and the converter
+version, kept in a bounded in-memory LRU and optionally in a directory on
+disk that survives restarts and is shared by all web workers. Disk entries
+not read or written for ``disk_ttl`` seconds are removed.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Minimum seconds between scans of the disk tier for expired entries
+SWEEP_INTERVAL = 60
+
+
+def cache_key(data, version):
+    """Return the cache key for uploaded bytes and a converter version.
+
+    ``data`` may also be a seekable binary file, which is hashed in chunks
+    and rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    digest.update(version.encode('utf-8'))
+    digest.update(b'\0')
+    if hasattr(data, 'read'):
+        for chunk in iter(lambda: data.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+        data.seek(0)
+    else:
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """Thread-safe LRU cache of rendered XML bytes with an optional disk tier."""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, directory=None,
+                 disk_ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory else None
+        self.disk_ttl = disk_ttl
+        self._last_sweep = 0.0
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _disk_path(self, key):
+        # Sidecar keys such as "<key>.header.json" carry their own extension
+        return self.directory / (key if '.' in key else f"{key}.xml")
+
+    def get(self, key):
+        """Return cached XML bytes for key, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.directory:
+            path = self._disk_path(key)
+            try:
+                value = path.read_bytes()
+                # Keep entries that are still being read from expiring
+                os.utime(path)
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store XML bytes under key."""
+        with self._lock:
+            self._store(key, value)
+
+        if self.directory:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(value)
+                os.replace(tmp_path, self._disk_path(key))
+            except OSError:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            self.sweep()
+
+    def sweep(self, force=False):
+        """Remove disk entries older than disk_ttl (at most every SWEEP_INTERVAL s)."""
+        if not self.directory or self.disk_ttl is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_sweep < SWEEP_INTERVAL:
+                return 0
+            self._last_sweep = now
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        for entry in entries:
+            try:
+                if now - entry.stat().st_mtime > self.disk_ttl:
+                    os.unlink(entry.path)
+                    removed += 1
+            except OSError:
+                # Removed or replaced by another worker meanwhile
+                pass
+        return removed
+
+    def _store(self, key, value):
+        """Insert into the memory tier and evict; caller holds the lock."""
+        if len(value) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = value
+        self._size += len(value)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk': str(self.directory) if self.directory else None,
+                'disk_ttl': self.disk_ttl,
+            }
@@ -6,11 +6,30 @@ Converts Serbian bank statements from HTML to iBank XML format.
 Handles Erste Bank statement format with proper span-based parsing.
 """
 
+import argparse
+import codecs
+import csv
+import fnmatch
+import glob
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import os
 import re
+import signal
 import sys
-from pathlib import Path
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
+import tarfile
+import time
+import zipfile
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from pathlib import Path, PurePosixPath
+from xml.etree.ElementTree import Element, SubElement, XMLPullParser
 
 try:
     from bs4 import BeautifulSoup
@@ -21,8 +40,478 @@ except ImportError:
     sys.exit(1)
 
 
+# Bump whenever the generated XML changes; it is part of conversion cache keys.
+CONVERTER_VERSION = '1.2.0'
+
+SPAN_BACKENDS = ('bs4', 'stream')
+
+# How transactions are located: by table row and column header, or by span
+# position. The table layout falls back to span positions when the statement
+# has no recognisable transaction table.
+TRANSACTION_LAYOUTS = ('table', 'spans')
+
+# Statement files picked up from directories in batch mode
+STATEMENT_PATTERNS = ('Dinarski izvod*.html', 'Devizni izvod*.html')
+
+DEFAULT_MANIFEST = '.izvodi_manifest.json'
+
+# Archives of statements, read and written without extracting to disk
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz')
+
+# Statements with at least this many rows are split into chunks of
+# PARALLEL_CHUNK_ROWS rows for a process pool; smaller ones stay in-process.
+PARALLEL_MIN_ROWS = 10000
+PARALLEL_CHUNK_ROWS = 5000
+
+# Watch mode: seconds between directory scans, and how long a file must stay
+# unchanged (size and mtime) before it is converted
+WATCH_INTERVAL = 1.0
+WATCH_SETTLE = 2.0
+
+# Tags whose text BeautifulSoup stores as non-NavigableString types, which
+# get_text() skips.
+_SKIP_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+# Empty-element tags as known to bs4's HTML tree builder.
+_VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+    'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid',
+    'spacer',
+])
+
+
+class SpanTextExtractor(HTMLParser):
+    """Event-driven span text extractor.
+
+    Produces the same texts as ``span.get_text(strip=True)`` for every
+    ``soup.find_all('span')`` match, without building a tree. Texts are
+    released in document order as soon as their span (and every span
+    opened before it) is closed.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._stack = []        # (tag, slot index or None)
+        self._open_counts = {}
+        self._open_spans = []   # slot indices of currently open spans
+        self._slots = []        # list of text parts (open) or str (closed)
+        self._released = 0
+        self._data = []
+        self._skip = 0
+
+    def _flush(self):
+        if not self._data:
+            return
+        text = ''.join(self._data).strip()
+        self._data = []
+        if text and not self._skip:
+            for slot in self._open_spans:
+                self._slots[slot].append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in _VOID_TAGS:
+            return
+        slot = None
+        if tag == 'span':
+            slot = len(self._slots)
+            self._slots.append([])
+            self._open_spans.append(slot)
+        elif tag in _SKIP_TEXT_TAGS:
+            self._skip += 1
+        self._stack.append((tag, slot))
+        self._open_counts[tag] = self._open_counts.get(tag, 0) + 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if not self._open_counts.get(tag):
+            return
+        while self._stack:
+            name, slot = self._stack.pop()
+            self._open_counts[name] -= 1
+            if slot is not None:
+                self._open_spans.pop()
+                self._slots[slot] = ''.join(self._slots[slot])
+            elif name in _SKIP_TEXT_TAGS:
+                self._skip -= 1
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith('CDATA['):
+            self._data.append(data[len('CDATA['):])
+            self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+        while self._stack:
+            self.handle_endtag(self._stack[-1][0])
+
+    def drain(self):
+        """Yield non-empty texts of spans that are complete."""
+        for _, text in self._release():
+            yield text
+
+    def _release(self):
+        """Yield ``(slot index, text)`` of complete non-empty spans in order."""
+        slots = self._slots
+        while self._released < len(slots) and isinstance(slots[self._released], str):
+            index = self._released
+            self._released += 1
+            if slots[index]:
+                yield index, slots[index]
+        if self._released == len(slots) and not self._open_spans:
+            self._slots = []
+            self._released = 0
+
+
+def _colspan(attrs):
+    for name, value in attrs:
+        if name == 'colspan':
+            try:
+                return max(int(value), 1)
+            except (TypeError, ValueError):
+                return 1
+    return 1
+
+
+class SpanCellExtractor(SpanTextExtractor):
+    """Span text extractor that also reports the table cell of every span.
+
+    ``drain()`` yields ``(text, cell)`` pairs where ``cell`` is
+    ``(row, column)`` of the innermost enclosing ``<td>``/``<th>`` (column
+    counted with colspans), or None for spans outside a cell. ``widths``
+    maps every row to its number of columns, empty cells included.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._coords = []   # cell of every span slot
+        self._tables = []   # [row, next column] per open table
+        self._loose = [None, 0]  # rows outside any table
+        self._cells = []    # (cell, table depth) of open cells
+        self._rows = 0
+        self.widths = {}    # row -> number of columns
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self._tables.append([None, 0])
+        elif tag == 'tr':
+            self._rows += 1
+            (self._tables[-1] if self._tables else self._loose)[:] = [self._rows, 0]
+            self.widths[self._rows] = 0
+        elif tag == 'td' or tag == 'th':
+            depth = len(self._tables)
+            if self._cells and self._cells[-1][1] == depth:
+                # A cell opened directly inside another cell is not in a row
+                self._cells.append(((None, 0), depth))
+            else:
+                table = self._tables[-1] if self._tables else self._loose
+                self._cells.append(((table[0], table[1]), depth))
+                table[1] += _colspan(attrs)
+                if table[0] is not None:
+                    self.widths[table[0]] = table[1]
+        elif tag == 'span':
+            self._coords.append(self._cells[-1][0] if self._cells else None)
+        super().handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self._open_counts.get(tag):
+            for name, _ in reversed(self._stack):
+                if name == 'td' or name == 'th':
+                    self._cells.pop()
+                elif name == 'table':
+                    self._tables.pop()
+                if name == tag:
+                    break
+        super().handle_endtag(tag)
+
+    def drain(self):
+        """Yield ``(text, cell)`` of spans that are complete."""
+        coords = self._coords
+        for index, text in self._release():
+            yield text, coords[index]
+        if not self._slots:
+            self._coords = []
+
+
+def iter_span_texts(html_content):
+    """Lazily yield span texts from a string or an iterable of str chunks."""
+    parser = SpanTextExtractor()
+    chunks = [html_content] if isinstance(html_content, str) else html_content
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.drain()
+    parser.close()
+    yield from parser.drain()
+
+
+def extract_span_texts(html_content, backend='bs4'):
+    """Return the non-empty stripped text of every span, in document order."""
+    if backend == 'stream':
+        return list(iter_span_texts(html_content))
+    if backend != 'bs4':
+        raise ValueError(f"Unknown span backend: {backend}")
+    return soup_span_texts(BeautifulSoup(html_content, 'html.parser'))
+
+
+def extract_span_cells(html_content, backend='bs4'):
+    """Return span texts, their ``(row, column)`` cells and the row widths.
+
+    Texts are the same as ``extract_span_texts``; ``cells`` runs parallel to
+    them and ``widths`` maps each row to its number of columns.
+    """
+    if backend == 'bs4':
+        return soup_span_cells(BeautifulSoup(html_content, 'html.parser'))
+    if backend != 'stream':
+        raise ValueError(f"Unknown span backend: {backend}")
+    parser = SpanCellExtractor()
+    chunks = [html_content] if isinstance(html_content, str) else html_content
+    pairs = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        pairs.extend(parser.drain())
+    parser.close()
+    pairs.extend(parser.drain())
+    return [text for text, _ in pairs], [cell for _, cell in pairs], parser.widths
+
+
+def soup_span_cells(soup):
+    """Like ``soup_span_texts`` but also return span cells and row widths.
+
+    Rows are numbered by their position in the document, so both backends
+    produce identical results.
+    """
+    rows = {}
+    for n, tr in enumerate(soup.find_all('tr'), 1):
+        rows[id(tr)] = n
+    columns = {}    # id(td) -> (row, column)
+    widths = {}
+    texts = []
+    cells = []
+    for span in soup.find_all('span'):
+        text = span.get_text(strip=True)
+        if not text:
+            continue
+        td = span.parent
+        while td is not None and td.name != 'td' and td.name != 'th':
+            td = td.parent
+        cell = None
+        if td is not None:
+            cell = columns.get(id(td))
+            if cell is None:
+                tr = td.parent
+                row = rows.get(id(tr)) if tr is not None and tr.name == 'tr' else None
+                if row is None:
+                    cell = columns[id(td)] = (None, 0)
+                else:
+                    # Index every cell of the row at once
+                    column = 0
+                    for child in tr.children:
+                        if child.name == 'td' or child.name == 'th':
+                            columns[id(child)] = (row, column)
+                            column += _colspan(child.attrs.items())
+                    widths[row] = column
+                    cell = columns[id(td)]
+        texts.append(text)
+        cells.append(cell)
+    return texts, cells, widths
+
+
+def soup_span_texts(soup):
+    """Return the non-empty stripped span texts of a parsed BeautifulSoup tree."""
+    texts = []
+    for span in soup.find_all('span'):
+        text = span.get_text(strip=True)
+        if text:
+            texts.append(text)
+    return texts
+
+
+def check_span_parity(html_content):
+    """Compare the stream backend against bs4.
+
+    Returns None when both produce identical texts, otherwise a tuple
+    ``(index, bs4_text, stream_text)`` describing the first difference.
+    """
+    expected = extract_span_texts(html_content, 'bs4')
+    actual = extract_span_texts(html_content, 'stream')
+    if expected == actual:
+        return None
+    for i in range(max(len(expected), len(actual))):
+        left = expected[i] if i < len(expected) else None
+        right = actual[i] if i < len(actual) else None
+        if left != right:
+            return (i, left, right)
+
+
+# Span classifier patterns. Header keywords are matched against the lowercased
+# span as a cheap prefilter; exact rules are applied only to spans that pass it.
+_HEADER_KEYWORDS_RE = re.compile('|'.join(re.escape(keyword.lower()) for keyword in [
+    'izvod broj i datum:', 'Valuta:', 'račun broj:', 'IBAN', 'doo', 'd.o.o',
+    ' pr ', 'Početno stanje', 'Krajnje stanje', 'Ukupno na teret',
+    'Ukupno u korist', 'PREGLED SVIH VAŠIH TRANSAKCIJA', 'PREGLED VAŠIH TRANSAKCIJA',
+]))
+_STATEMENT_NO_RE = re.compile(r'(\d+)/(\d{2}\.\d{2}\.\d{4})')
+_CURRENCY_RE = re.compile(r'([A-Z]{3})')
+_ACCOUNT_RE = re.compile(r'(\d{18}|\d{12})')
+_IBAN_RE = re.compile(r'RS\d{20}')
+_BALANCE_RE = re.compile(r'([\d.,]+)\s*[A-Z]{3}')
+_SERIAL_RE = re.compile(r'^\d+$')
+_DATE_RE = re.compile(r'(\d{2}\.\d{2}\.\d{4})')
+_FT_PREFIX_RE = re.compile(r'FT\d+')
+_FT_REF_RE = re.compile(r'(FT\d+[A-Z0-9]*)')
+_DASHED_REF_RE = re.compile(r'\d+-\d+')
+_PAYEE_RE = re.compile(r'^[A-ZČĆŽŠĐ][A-ZČĆŽŠĐ\s]+$')
+_AMOUNT_RE = re.compile(r'^([\d.,]+)$')
+_CURRENCY_CODE_RE = re.compile(r'[A-Z]{3}')
+_SERBIAN_AMOUNT_RE = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d{2})')
+_ORDINAL_PREFIX_RE = re.compile(r'^1/')
+_ORDINAL_REST_RE = re.compile(r',?\s*2/.*$')
+
+# Transaction table column headers (lowercased) -> field
+_TABLE_COLUMNS = {
+    'r.br.': 'serial',
+    'datum prijema': 'posted',
+    'datum izvršenja': 'avail',
+    'opis': 'description',
+    'referenca': 'reference',
+    'na teret': 'debit',
+    'isplate': 'debit',
+    'u korist': 'credit',
+    'uplate': 'credit',
+}
+
+
+class LabelScanner:
+    """Tokenize a text block on a set of labels in one regex pass.
+
+    ``labels`` maps a name to the regex of that label. All labels are
+    joined into a single alternation and the block is split on it once.
+    Labels are matched left to right without overlapping, so a label that
+    could swallow the start of another stops short with a lookahead
+    (``RR(?=N)``); each label must match its own distinct text.
+
+    ``scan`` returns a dict of name -> list of (start, end) spans in
+    document order; labels that do not occur are missing from the dict.
+    """
+
+    def __init__(self, labels):
+        self.names = tuple(labels)
+        self.pattern = re.compile('(' + '|'.join(f'(?:{regex})' for regex in labels.values()) + ')')
+        self._named = re.compile('|'.join(f'(?P<{name}>{regex})' for name, regex in labels.items()))
+        self._token_names = {}
+
+    def scan(self, text):
+        found = {}
+        pieces = self.pattern.split(text)
+        token_names = self._token_names
+        pos = len(pieces[0])
+        for i in range(1, len(pieces), 2):
+            token = pieces[i]
+            name = token_names.get(token)
+            if name is None:
+                name = self._named.match(text, pos).lastgroup
+                if len(token_names) < 256:
+                    token_names[token] = name
+            end = pos + len(token)
+            found.setdefault(name, []).append((pos, end))
+            pos = end + len(pieces[i + 1])
+        return found
+
+
+# Labels of the free-text description block of foreign (FT) transactions
+_FOREIGN_LABELS = LabelScanner({
+    'ft': r'FT(?=\d[A-Z0-9])',
+    'bank': r'Banka',
+    'payer': r'Nalogodavac',
+    'country': r'Zemlja',
+    'basis': r'Osnov:',
+    'description': r'Opis:',
+    'rrn': r'RR(?=N)',
+    'amount': r'Iznos:',
+})
+
+
+_SPACE_RUN_RE = re.compile(r'\s*')
+
+
+def _skip_space(text, pos):
+    """Return the index of the first non-whitespace character at or after pos."""
+    return _SPACE_RUN_RE.match(text, pos).end()
+
+
+def _strip_span(text, start, end):
+    """Narrow (start, end) the way ``str.strip`` would."""
+    value = text[start:end]
+    stripped = value.strip()
+    if not stripped:
+        return start, start
+    start += len(value) - len(value.lstrip())
+    return start, start + len(stripped)
+
+
+def _line_value(text, pos):
+    """Span captured by ``<label>\\s*([^\\n]+)`` with the label ending at pos."""
+    end = len(text)
+    start = _skip_space(text, pos)
+    if start == end:
+        # Only whitespace follows: \s* backtracks to hand a non-newline to the group
+        start = next((i for i in range(end - 1, pos - 1, -1) if text[i] != '\n'), None)
+        if start is None:
+            return None
+    stop = text.find('\n', start)
+    return start, end if stop < 0 else stop
+
+
+def _lazy_value(text, pos, forbidden, stops):
+    """Span captured by ``<label>\\s*([^X]+?)(?:<stop>|$)`` with the label ending at pos.
+
+    ``forbidden`` is the excluded character X and ``stops`` the sorted start
+    positions of the terminating labels.
+    """
+    end = len(text)
+    start = _skip_space(text, pos)
+    if start < end:
+        limit = text.find(forbidden, start)
+        if limit < 0:
+            limit = end
+        # Nearest terminator: a stop label, or $ at the end (or before a final newline)
+        stop = min((s for s in stops if s > start), default=end)
+        if text.endswith('\n') and end - 1 > start:
+            stop = min(stop, end - 1)
+        if stop <= limit:
+            return start, stop
+    # \s* may give back one whitespace character when a terminator follows it
+    if start > pos and (start == end or start in stops):
+        return start - 1, start
+    return None
+
+
 class Transaction:
     """Bank transaction."""
+    __slots__ = (
+        'serial_no', 'fitid', 'trntype', 'benefit', 'dtposted', 'dtuser',
+        'dtavail', 'trnamt', 'purpose', 'payee_name', 'payee_account',
+        'payee_bank', 'payee_refnumber', 'payee_refmodel', 'purposecode',
+        'urgency',
+    )
+
     def __init__(self):
         self.serial_no = ""
         self.fitid = ""
@@ -42,6 +531,160 @@ class Transaction:
         self.urgency = "INT"
 
 
+def to_minor(amount):
+    """Convert an amount to integer minor units (para/cents) as it prints."""
+    return int(f"{amount:.2f}".replace('.', ''))
+
+
+def format_minor(minor):
+    """Format integer minor units as a decimal amount with two places."""
+    sign = '-' if minor < 0 else ''
+    minor = abs(minor)
+    return f"{sign}{minor // 100}.{minor % 100:02d}"
+
+
+class TransactionTable:
+    """Columnar store of transactions.
+
+    Each field is kept in its own column, amounts as exact integer minor
+    units in an ``array``. Low-cardinality string fields are interned in a
+    per-table pool so repeated values share one object. Iterating yields
+    ``Transaction`` objects, so code written against a plain list keeps
+    working.
+    """
+
+    STRING_FIELDS = (
+        'serial_no', 'fitid', 'trntype', 'benefit', 'dtposted', 'dtuser',
+        'dtavail', 'purpose', 'payee_name', 'payee_account', 'payee_bank',
+        'payee_refnumber', 'payee_refmodel', 'purposecode', 'urgency',
+    )
+    INTERNED_FIELDS = frozenset([
+        'trntype', 'benefit', 'dtposted', 'dtuser', 'dtavail', 'payee_bank',
+        'payee_refmodel', 'purposecode', 'urgency',
+    ])
+
+    __slots__ = ('columns', 'amounts', '_pool')
+
+    def __init__(self, transactions=()):
+        self.columns = {field: [] for field in self.STRING_FIELDS}
+        self.amounts = array('q')
+        self._pool = {}
+        for trn in transactions:
+            self.append(trn)
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __iter__(self):
+        for i in range(len(self.amounts)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        trn = Transaction()
+        for field, column in self.columns.items():
+            setattr(trn, field, column[index])
+        trn.trnamt = self.amounts[index] / 100
+        return trn
+
+    def append(self, trn):
+        """Append a ``Transaction``."""
+        pool = self._pool
+        for field, column in self.columns.items():
+            value = getattr(trn, field)
+            if field in self.INTERNED_FIELDS:
+                value = pool.setdefault(value, value)
+            column.append(value)
+        self.amounts.append(to_minor(trn.trnamt))
+
+    def extend(self, transactions):
+        """Append every transaction from an iterable."""
+        for trn in transactions:
+            self.append(trn)
+
+    def extend_table(self, other):
+        """Append all rows of another table, column by column."""
+        pool = self._pool
+        for field, column in self.columns.items():
+            values = other.columns[field]
+            if field in self.INTERNED_FIELDS:
+                values = [pool.setdefault(value, value) for value in values]
+            column.extend(values)
+        self.amounts.extend(other.amounts)
+
+    def section(self, start, stop):
+        """Return rows ``start:stop`` as a new table sharing the values."""
+        table = TransactionTable()
+        for field, column in self.columns.items():
+            table.columns[field] = column[start:stop]
+        table.amounts = self.amounts[start:stop]
+        return table
+
+    def iter_rows(self, fields):
+        """Yield a tuple of ``fields`` per transaction straight from the columns.
+
+        ``trnamt`` is yielded as integer minor units.
+        """
+        return zip(*(self.amounts if field == 'trnamt' else self.columns[field]
+                     for field in fields))
+
+    def total(self, benefit=None):
+        """Sum of amounts in minor units, optionally only for one benefit."""
+        if benefit is None:
+            return sum(self.amounts)
+        return sum(amount for amount, value in zip(self.amounts, self.columns['benefit'])
+                   if value == benefit)
+
+    def totals_by(self, field):
+        """Sum of amounts in minor units grouped by the values of ``field``."""
+        totals = {}
+        for amount, value in zip(self.amounts, self.columns[field]):
+            totals[value] = totals.get(value, 0) + amount
+        return totals
+
+    def totals_by_benefit(self):
+        """Sum of amounts per benefit (debit/credit)."""
+        return self.totals_by('benefit')
+
+    def totals_by_date(self, field='dtposted'):
+        """Sum of amounts per posting date."""
+        return self.totals_by(field)
+
+    def totals_by_payee(self):
+        """Sum of amounts per payee name."""
+        return self.totals_by('payee_name')
+
+    def find(self, benefit=None, text=None, date_from=None, date_to=None,
+             min_amount=None, max_amount=None):
+        """Return the indices of transactions matching every given filter.
+
+        ``text`` is matched case-insensitively against payee, purpose,
+        payee account and reference. Dates compare against the ISO
+        ``dtposted`` prefix, amounts are in minor units.
+        """
+        columns = self.columns
+        dates = columns['dtposted']
+        needle = text.lower() if text else None
+        matches = []
+        for i, (amount, value) in enumerate(zip(self.amounts, columns['benefit'])):
+            if benefit and value != benefit:
+                continue
+            if min_amount is not None and amount < min_amount:
+                continue
+            if max_amount is not None and amount > max_amount:
+                continue
+            if date_from and dates[i][:10] < date_from:
+                continue
+            if date_to and dates[i][:10] > date_to:
+                continue
+            if needle and not any(needle in columns[field][i].lower() for field in
+                                  ('payee_name', 'purpose', 'payee_account', 'fitid')):
+                continue
+            matches.append(i)
+        return matches
+
+
 class BankStatement:
     """Bank statement parser."""
 
@@ -54,91 +697,174 @@ class BankStatement:
         self.account_holder = ""
         self.beginning_balance = 0.0
         self.ending_balance = 0.0
-        self.transactions = []
+        self.transactions = TransactionTable()
         self.total_debit = 0.0
         self.total_credit = 0.0
-
-    def parse_html(self, html_content):
-        """Parse HTML content."""
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # Extract all span texts
-        spans = soup.find_all('span')
-        texts = [s.get_text(strip=True) for s in spans if s.get_text(strip=True)]
-
-        # Parse basic info
-        self._parse_basic_info(texts)
+        self.span_count = 0
+        self.timings = {}
+        self.source_format = ''
+
+    def _timed(self, stage, start):
+        """Record seconds spent in ``stage`` since ``start``; return a new start."""
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - start
+        return now
+
+    def parse_html(self, html_content, backend='bs4', layout='table', executor=None):
+        """Parse HTML content.
+
+        ``html_content`` is a str or an iterable of str chunks; the stream
+        backend consumes chunks as they come. ``layout`` selects the
+        transaction parser (see TRANSACTION_LAYOUTS). An optional process
+        pool ``executor`` decodes the rows of large statements in parallel
+        (table layout only). Per-stage durations are recorded in
+        ``self.timings``.
+        """
+        if layout not in TRANSACTION_LAYOUTS:
+            raise ValueError(f"Unknown transaction layout: {layout}")
+        start = time.perf_counter()
+
+        # Extract all span texts (and their table cells for the table layout)
+        cells = None
+        if backend == 'bs4':
+            if not isinstance(html_content, str):
+                html_content = ''.join(html_content)
+            soup = BeautifulSoup(html_content, 'html.parser')
+            start = self._timed('soup', start)
+            if layout == 'table':
+                texts, cells, widths = soup_span_cells(soup)
+            else:
+                texts = soup_span_texts(soup)
+        elif layout == 'table':
+            texts, cells, widths = extract_span_cells(html_content, backend)
+        else:
+            texts = extract_span_texts(html_content, backend)
+        start = self._timed('spans', start)
+        self.span_count = len(texts)
+
+        # Parse basic info (also locates the transaction section)
+        trans_start = self._parse_basic_info(texts)
+        start = self._timed('header', start)
 
         # Parse transactions
-        self._parse_transactions(texts)
+        if cells is None or not self._parse_table_rows(texts, cells, widths, trans_start, executor):
+            self._parse_transactions(texts, trans_start)
+        self._timed('transactions', start)
 
         return self
 
     def _parse_basic_info(self, texts):
-        """Extract basic statement information."""
-        for i, text in enumerate(texts):
-            # Statement number and date
-            if 'izvod broj i datum:' in text.lower():
-                match = re.search(r'(\d+)/(\d{2}\.\d{2}\.\d{4})', text)
-                if match:
-                    self.statement_number = match.group(1)
-                    self.statement_date = match.group(2)
-
-            # Currency
-            elif 'Valuta:' in text:
-                match = re.search(r'([A-Z]{3})', text)
-                if match:
-                    self.currency = match.group(1)
-
-            # Account number
-            elif 'Platni račun broj:' in text or 'račun broj:' in text:
-                match = re.search(r'(\d{18}|\d{12})', text)
-                if match:
-                    self.account_number = match.group(1)
-
-            # IBAN
-            elif 'IBAN' in text:
-                match = re.search(r'RS\d{20}', text)
-                if match:
-                    self.iban = match.group(0)
-
-            # Account holder
-            elif ('doo' in text.lower() or 'd.o.o' in text.lower() or
-                  ' pr ' in text.lower()) and not self.account_holder:
-                self.account_holder = text.split('\n')[0].split('Adresa:')[0].strip()
-
-            # Balances
-            elif 'Početno stanje' in text:
-                balance_text = texts[i+1] if i+1 < len(texts) else text
-                match = re.search(r'([\d.,]+)\s*[A-Z]{3}', balance_text)
-                if match:
-                    self.beginning_balance = self._parse_amount(match.group(1))
-
-            elif 'Krajnje stanje' in text:
-                balance_text = texts[i+1] if i+1 < len(texts) else text
-                match = re.search(r'([\d.,]+)\s*[A-Z]{3}', balance_text)
-                if match:
-                    self.ending_balance = self._parse_amount(match.group(1))
-
-            # Totals
-            elif 'Ukupno na teret' in text and i+1 < len(texts):
-                match = re.search(r'([\d.,]+)\s*[A-Z]{3}', texts[i+1])
-                if match:
-                    self.total_debit = self._parse_amount(match.group(1))
-
-            elif 'Ukupno u korist' in text and i+1 < len(texts):
-                match = re.search(r'([\d.,]+)\s*[A-Z]{3}', texts[i+1])
-                if match:
-                    self.total_credit = self._parse_amount(match.group(1))
-
-    def _parse_transactions(self, texts):
-        """Parse transactions from span sequence."""
-        # Find transaction section
+        """Extract basic statement information in a single pass over the spans.
+
+        Spans are tagged with a header label by ``_classify_header`` and
+        dispatched through ``_HEADER_HANDLERS``. Returns the index of the
+        transaction section marker, or -1.
+        """
         trans_start = -1
+        prefilter = _HEADER_KEYWORDS_RE.search
         for i, text in enumerate(texts):
-            if 'PREGLED SVIH VAŠIH TRANSAKCIJA' in text or 'PREGLED VAŠIH TRANSAKCIJA' in text:
+            lower = text.lower()
+            if not prefilter(lower):
+                continue
+            if trans_start < 0 and ('PREGLED SVIH VAŠIH TRANSAKCIJA' in text or
+                                    'PREGLED VAŠIH TRANSAKCIJA' in text):
                 trans_start = i
-                break
+            label = self._classify_header(text, lower)
+            if label:
+                getattr(self, self._HEADER_HANDLERS[label])(texts, i, text)
+        return trans_start
+
+    def _classify_header(self, text, lower):
+        """Return the header label of a span, in the original rule precedence."""
+        if 'izvod broj i datum:' in lower:
+            return 'statement'
+        if 'Valuta:' in text:
+            return 'currency'
+        if 'Platni račun broj:' in text or 'račun broj:' in text:
+            return 'account'
+        if 'IBAN' in text:
+            return 'iban'
+        if ('doo' in lower or 'd.o.o' in lower or ' pr ' in lower) and not self.account_holder:
+            return 'holder'
+        if 'Početno stanje' in text:
+            return 'opening_balance'
+        if 'Krajnje stanje' in text:
+            return 'ending_balance'
+        if 'Ukupno na teret' in text:
+            return 'total_debit'
+        if 'Ukupno u korist' in text:
+            return 'total_credit'
+        return None
+
+    _HEADER_HANDLERS = {
+        'statement': '_header_statement',
+        'currency': '_header_currency',
+        'account': '_header_account',
+        'iban': '_header_iban',
+        'holder': '_header_holder',
+        'opening_balance': '_header_opening_balance',
+        'ending_balance': '_header_ending_balance',
+        'total_debit': '_header_total_debit',
+        'total_credit': '_header_total_credit',
+    }
+
+    def _header_statement(self, texts, i, text):
+        match = _STATEMENT_NO_RE.search(text)
+        if match:
+            self.statement_number = match.group(1)
+            self.statement_date = match.group(2)
+
+    def _header_currency(self, texts, i, text):
+        match = _CURRENCY_RE.search(text)
+        if match:
+            self.currency = match.group(1)
+
+    def _header_account(self, texts, i, text):
+        match = _ACCOUNT_RE.search(text)
+        if match:
+            self.account_number = match.group(1)
+
+    def _header_iban(self, texts, i, text):
+        match = _IBAN_RE.search(text)
+        if match:
+            self.iban = match.group(0)
+
+    def _header_holder(self, texts, i, text):
+        self.account_holder = text.split('\n')[0].split('Adresa:')[0].strip()
+
+    def _header_opening_balance(self, texts, i, text):
+        balance_text = texts[i+1] if i+1 < len(texts) else text
+        match = _BALANCE_RE.search(balance_text)
+        if match:
+            self.beginning_balance = self._parse_amount(match.group(1))
+
+    def _header_ending_balance(self, texts, i, text):
+        balance_text = texts[i+1] if i+1 < len(texts) else text
+        match = _BALANCE_RE.search(balance_text)
+        if match:
+            self.ending_balance = self._parse_amount(match.group(1))
+
+    def _header_total_debit(self, texts, i, text):
+        if i+1 < len(texts):
+            match = _BALANCE_RE.search(texts[i+1])
+            if match:
+                self.total_debit = self._parse_amount(match.group(1))
+
+    def _header_total_credit(self, texts, i, text):
+        if i+1 < len(texts):
+            match = _BALANCE_RE.search(texts[i+1])
+            if match:
+                self.total_credit = self._parse_amount(match.group(1))
+
+    def _parse_transactions(self, texts, trans_start=None):
+        """Parse transactions from span sequence."""
+        # Find transaction section
+        if trans_start is None:
+            trans_start = -1
+            for i, text in enumerate(texts):
+                if 'PREGLED SVIH VAŠIH TRANSAKCIJA' in text or 'PREGLED VAŠIH TRANSAKCIJA' in text:
+                    trans_start = i
+                    break
 
         if trans_start < 0:
             return
@@ -156,12 +882,14 @@ class BankStatement:
         i = data_start
         max_iterations = len(texts) - data_start
         iteration = 0
+        is_serial = _SERIAL_RE.match
 
         while i < len(texts) and iteration < max_iterations:
             iteration += 1
 
             # Check if this looks like a serial number (start of transaction)
-            if re.match(r'^\d+$', texts[i]) and len(texts[i]) <= 3:
+            text = texts[i]
+            if len(text) <= 3 and is_serial(text):
                 trn = self._parse_transaction_sequence(texts, i)
                 if trn and trn.trnamt > 0:
                     self.transactions.append(trn)
@@ -174,6 +902,142 @@ class BankStatement:
             else:
                 i += 1
 
+    def _parse_table_rows(self, texts, cells, widths, trans_start, executor=None):
+        """Parse transactions row by row, mapping cells to fields by column header.
+
+        ``cells`` holds the ``(row, column)`` of every span and ``widths`` the
+        number of columns of every row. With an ``executor`` the rows of a
+        large statement are decoded in chunks of PARALLEL_CHUNK_ROWS in worker
+        processes and appended in order. Returns False if no column header
+        row follows the transaction section marker or no row could be decoded.
+        """
+        if trans_start < 0:
+            return False
+
+        # Index the spans after the marker by row and column, once
+        rows = {}
+        current = row = None
+        for i in range(trans_start + 1, len(texts)):
+            cell = cells[i]
+            if cell is None or cell[0] is None:
+                continue
+            key, column = cell
+            if key != current:
+                current = key
+                row = rows.setdefault(key, {})
+            values = row.get(column)
+            if values is None:
+                row[column] = [texts[i]]
+            else:
+                values.append(texts[i])
+
+        row_iter = iter(rows.items())
+        for key, row in row_iter:
+            header = {}
+            for column, values in row.items():
+                field = _TABLE_COLUMNS.get(' '.join(values).lower())
+                if field:
+                    header[field] = column
+            if 'serial' in header:
+                break
+        else:
+            return False
+
+        # Columns up to the description are matched from the left, the rest
+        # from the right edge of the row, so surplus cells in a row (e.g. a
+        # separate payee cell) belong to the description.
+        width = widths[key]
+        start = header.pop('description', width)
+        left = {field: column for field, column in header.items() if column < start}
+        right = {field: column for field, column in header.items() if column > start}
+        end = min(right.values(), default=width)
+
+        description = (start, end)
+        if executor is None:
+            for key, row in row_iter:
+                trn = self._parse_table_row(row, widths[key] - width, left, right, description)
+                if trn and trn.trnamt > 0:
+                    self.transactions.append(trn)
+            return len(self.transactions) > 0
+
+        pending = [(row, widths[key] - width) for key, row in row_iter]
+        if len(pending) < PARALLEL_MIN_ROWS:
+            chunks = [_decode_table_rows(pending, left, right, description)]
+        else:
+            chunks = executor.map(
+                _decode_table_rows,
+                [pending[i:i + PARALLEL_CHUNK_ROWS] for i in range(0, len(pending), PARALLEL_CHUNK_ROWS)],
+                itertools.repeat(left), itertools.repeat(right), itertools.repeat(description))
+        for table in chunks:
+            self.transactions.extend_table(table)
+        return len(self.transactions) > 0
+
+    def _parse_table_row(self, row, surplus, left, right, description):
+        """Decode one transaction row (``column -> texts``).
+
+        ``left`` and ``right`` map fields to header columns, ``description``
+        is the header's description column range and ``surplus`` is how many
+        more columns this row has than the header.
+        """
+        columns = sorted(row)
+        texts = [text for column in columns for text in row[column]]
+        if not texts or len(texts[0]) > 3 or not _SERIAL_RE.match(texts[0]):
+            return None
+
+        trn = Transaction()
+        trn.serial_no = texts[0]
+
+        # Foreign exchange rows do not follow the column headers
+        if len(texts) > 1 and _FT_PREFIX_RE.match(texts[1]):
+            return self._parse_foreign_transaction(texts, 1, trn)
+
+        fields = {}
+        for field, column in left.items():
+            if column in row:
+                fields[field] = row[column][0]
+        for field, column in right.items():
+            if column + surplus in row:
+                fields[field] = row[column + surplus][0]
+        start, end = description
+        description = [text for column in columns
+                       if start <= column < end + surplus for text in row[column]]
+
+        for field, attr in (('posted', 'dtposted'), ('avail', 'dtavail')):
+            date_match = _DATE_RE.search(fields[field]) if field in fields else None
+            if date_match:
+                setattr(trn, attr, self._convert_date(date_match.group(1)))
+        trn.dtuser = trn.dtposted
+
+        for text in description:
+            if not trn.purpose and not _DATE_RE.match(text) and \
+               not _FT_PREFIX_RE.match(text) and not text.isupper():
+                trn.purpose = text[:140]
+            elif not (trn.payee_name or trn.payee_bank) and _PAYEE_RE.match(text):
+                if 'BANK' in text or 'BANKA' in text:
+                    trn.payee_bank = text
+                else:
+                    trn.payee_name = text
+
+        ref = fields.get('reference')
+        if ref:
+            ft_match = _FT_REF_RE.search(ref) if 'FT' in ref else None
+            if ft_match:
+                trn.fitid = ft_match.group(1)
+                trn.payee_refnumber = trn.fitid
+            elif _DASHED_REF_RE.match(ref):
+                trn.fitid = ref
+                trn.payee_refnumber = ref
+
+        for benefit in ('debit', 'credit'):
+            amt_match = _AMOUNT_RE.match(fields[benefit]) if benefit in fields else None
+            amt = self._parse_amount(amt_match.group(1)) if amt_match else 0.0
+            if amt > 0:
+                trn.benefit = benefit
+                trn.trnamt = amt
+                break
+
+        return trn
+
     def _parse_transaction_sequence(self, texts, start_idx):
         """Parse a single transaction from sequential spans."""
         trn = Transaction()
@@ -198,7 +1062,7 @@ class BankStatement:
 
         # 2. Receipt date
         if idx < len(texts):
-            date_match = re.search(r'(\d{2}\.\d{2}\.\d{4})', texts[idx])
+            date_match = _DATE_RE.search(texts[idx])
             if date_match:
                 trn.dtposted = self._convert_date(date_match.group(1))
                 trn.dtuser = trn.dtposted
@@ -206,7 +1070,7 @@ class BankStatement:
 
         # 3. Execution date
         if idx < len(texts):
-            date_match = re.search(r'(\d{2}\.\d{2}\.\d{4})', texts[idx])
+            date_match = _DATE_RE.search(texts[idx])
             if date_match:
                 trn.dtavail = self._convert_date(date_match.group(1))
                 idx += 1
@@ -214,8 +1078,8 @@ class BankStatement:
         # 4. Description
         if idx < len(texts):
             desc = texts[idx]
-            if not re.match(r'\d{2}\.\d{2}\.\d{4}', desc) and \
-               not re.match(r'FT\d+', desc) and \
+            if not _DATE_RE.match(desc) and \
+               not _FT_PREFIX_RE.match(desc) and \
                not desc.isupper():
                 trn.purpose = desc[:140]
                 idx += 1
@@ -223,7 +1087,7 @@ class BankStatement:
         # 5. Payee (usually all caps)
         if idx < len(texts):
             payee = texts[idx]
-            if re.match(r'^[A-ZČĆŽŠĐ][A-ZČĆŽŠĐ\s]+$', payee):
+            if _PAYEE_RE.match(payee):
                 if 'BANK' in payee or 'BANKA' in payee:
                     trn.payee_bank = payee
                 else:
@@ -234,14 +1098,13 @@ class BankStatement:
         if idx < len(texts):
             ref = texts[idx]
             # Check if ref contains FT reference (may have prefixes like "PBZ:PBO:FT...")
-            if 'FT' in ref and re.search(r'FT\d+[A-Z0-9]*', ref):
+            ft_match = _FT_REF_RE.search(ref) if 'FT' in ref else None
+            if ft_match:
                 # Extract the FT part
-                ft_match = re.search(r'(FT\d+[A-Z0-9]*)', ref)
-                if ft_match:
-                    trn.fitid = ft_match.group(1)
-                    trn.payee_refnumber = trn.fitid
+                trn.fitid = ft_match.group(1)
+                trn.payee_refnumber = trn.fitid
                 idx += 1
-            elif re.match(r'FT\d+[A-Z0-9]*', ref) or re.match(r'\d+-\d+', ref):
+            elif _FT_REF_RE.match(ref) or _DASHED_REF_RE.match(ref):
                 trn.fitid = ref
                 trn.payee_refnumber = ref
                 idx += 1
@@ -252,7 +1115,7 @@ class BankStatement:
 
         for _ in range(2):
             if idx < len(texts):
-                amt_match = re.search(r'^([\d.,]+)$', texts[idx])
+                amt_match = _AMOUNT_RE.match(texts[idx])
                 if amt_match:
                     amt = self._parse_amount(amt_match.group(1))
                     if amt > 0:
@@ -278,62 +1141,92 @@ class BankStatement:
         return trn
 
     def _parse_foreign_transaction(self, texts, idx, trn):
-        """Parse foreign exchange transaction format."""
+        """Parse foreign exchange transaction format.
+
+        The description block is scanned once by ``_FOREIGN_LABELS``; each
+        field is then cut out of the block by label position.
+        """
         # Description block contains everything
         desc_block = texts[idx]
+        labels = _FOREIGN_LABELS.scan(desc_block)
 
-        # Extract FT reference
-        ft_match = re.search(r'(FT\d+[A-Z0-9]+)', desc_block)
-        if ft_match:
-            trn.fitid = ft_match.group(1)
+        # FT reference
+        if 'ft' in labels:
+            trn.fitid = _FT_REF_RE.match(desc_block, labels['ft'][0][0]).group(1)
             trn.payee_refnumber = trn.fitid
 
-        # Extract transaction type/description (first line after FT)
-        lines = desc_block.split('\n')
-        for line in lines:
-            if 'FT' not in line and len(line) > 5:
-                if not trn.purpose:
-                    trn.purpose = line[:140]
+        # Bank name: up to "Nalogodavac"/"Zemlja", unless an "N" comes first
+        if 'bank' in labels:
+            bank_stops = [start for start, _ in labels.get('payer', ())]
+            bank_stops += [start for start, _ in labels.get('country', ())]
+            for start, end in labels['bank']:
+                colon = desc_block.find(':', end)
+                if colon < 0:
+                    break
+                span = _lazy_value(desc_block, colon + 1, 'N', bank_stops)
+                if span:
+                    trn.payee_bank = desc_block[span[0]:span[1]].strip()
                     break
 
-        # Extract bank name (only the bank, not everything after)
-        bank_match = re.search(r'Banka[^:]*:\s*([^N]+?)(?:Nalogodavac|Zemlja|$)', desc_block)
-        if bank_match:
-            trn.payee_bank = bank_match.group(1).strip()
-
-        # Extract payer/payee name (only first part before "Zemlja")
-        payer_match = re.search(r'Nalogodavac:\s*([^Z]+?)(?:Zemlja|$)', desc_block)
-        if payer_match:
-            # Clean up the name - take only meaningful part
-            name = payer_match.group(1).strip()
-            # If it contains numbered items, take only first one
-            if '1/' in name:
-                name = re.sub(r'^1/', '', name)
-                name = re.sub(r',?\s*2/.*$', '', name)
-            trn.payee_name = name[:140]
-
-        # Extract purpose from "Osnov:" (reference number and description)
-        purpose_match = re.search(r'Osnov:\s*([^\n]+)', desc_block)
-        if purpose_match:
-            purpose = purpose_match.group(1).strip()
-            # Remove RRN suffix if present
-            purpose = re.sub(r'RRN.*$', '', purpose).strip()
-            trn.purpose = purpose[:140]
+        # Payer/payee name: up to "Zemlja", unless a "Z" comes first
+        if 'payer' in labels:
+            country_stops = [start for start, _ in labels.get('country', ())]
+            for start, end in labels['payer']:
+                if desc_block[end:end + 1] != ':':
+                    continue
+                span = _lazy_value(desc_block, end + 1, 'Z', country_stops)
+                if span:
+                    name = desc_block[span[0]:span[1]].strip()
+                    # If it contains numbered items, take only first one
+                    if '1/' in name:
+                        name = _ORDINAL_PREFIX_RE.sub('', name)
+                        name = _ORDINAL_REST_RE.sub('', name)
+                    trn.payee_name = name[:140]
+                    break
 
-        # Better: extract description from "Opis:" field if available
-        opis_match = re.search(r'Opis:\s*([^\n]+)', desc_block)
-        if opis_match:
-            desc = opis_match.group(1).strip()
-            # Remove "Iznos:" suffix if present
-            desc = re.sub(r'\s+Iznos:.*$', '', desc).strip()
-            if desc:
-                trn.purpose = desc[:140]
+        # Purpose, in order of preference: "Opis:" without the "Iznos:"
+        # suffix, "Osnov:" without the RRN suffix, first line without FT
+        purpose = None
+        if 'description' in labels:
+            span = _line_value(desc_block, labels['description'][0][1])
+            if span:
+                start, end = _strip_span(desc_block, *span)
+                for amount, _ in labels.get('amount', ()):
+                    if start < amount and amount + 6 <= end and desc_block[amount - 1].isspace():
+                        end = amount
+                        break
+                purpose = desc_block[start:end].strip() or None
+
+        if purpose is None and 'basis' in labels:
+            span = _line_value(desc_block, labels['basis'][0][1])
+            if span:
+                start, end = _strip_span(desc_block, *span)
+                for rrn, _ in labels.get('rrn', ()):
+                    if start <= rrn and rrn + 3 <= end:
+                        end = rrn
+                        break
+                purpose = desc_block[start:end].strip()
+
+        if purpose is None:
+            line_start = 0
+            while line_start <= len(desc_block):
+                line_end = desc_block.find('\n', line_start)
+                if line_end < 0:
+                    line_end = len(desc_block)
+                line = desc_block[line_start:line_end]
+                if 'FT' not in line and len(line) > 5:
+                    purpose = line
+                    break
+                line_start = line_end + 1
+
+        if purpose is not None:
+            trn.purpose = purpose[:140]
 
         idx += 1
 
         # Next span: dates
         if idx < len(texts):
-            dates = re.findall(r'(\d{2}\.\d{2}\.\d{4})', texts[idx])
+            dates = _DATE_RE.findall(texts[idx])
             if len(dates) >= 1:
                 trn.dtposted = self._convert_date(dates[0])
                 trn.dtuser = trn.dtposted
@@ -347,7 +1240,7 @@ class BankStatement:
         if idx < len(texts):
             # Use more specific regex for Serbian number format
             # Pattern: optional digits with dots (thousands), comma, exactly 2 decimals
-            amounts = re.findall(r'(\d{1,3}(?:\.\d{3})*,\d{2})', texts[idx])
+            amounts = _SERBIAN_AMOUNT_RE.findall(texts[idx])
 
             # Try to find amounts - typically 2 or 4 numbers (currency and RSD)
             valid_amounts = []
@@ -370,7 +1263,7 @@ class BankStatement:
         if not amount_str:
             return 0.0
         clean = amount_str.strip().replace('.', '').replace(',', '.')
-        clean = re.sub(r'[A-Z]{3}', '', clean).strip()
+        clean = _CURRENCY_CODE_RE.sub('', clean).strip()
         try:
             return float(clean)
         except:
@@ -395,8 +1288,13 @@ class BankStatement:
             return f"{clean[:3]}-{clean[3:16]}-{clean[16:]}"
         return account
 
-    def to_ibank_xml(self):
-        """Generate iBank XML."""
+    def to_ibank_xml(self, transactions=True):
+        """Generate iBank XML.
+
+        With ``transactions=False`` the ``trnlist`` element carries the count
+        but no ``stmttrn`` children, for rendering them separately.
+        """
+        start = time.perf_counter()
         root = Element('pmtnotification')
 
         SubElement(root, 'notificationtype').text = 'ibank.payment.notification.ledger'
@@ -441,13 +1339,14 @@ class BankStatement:
         SubElement(root, 'overdraftinterest')
         SubElement(root, 'period')
 
-        income = sum(t.trnamt for t in self.transactions if t.benefit == 'credit')
-        outflow = sum(t.trnamt for t in self.transactions if t.benefit == 'debit')
+        totals = self.transactions.totals_by_benefit()
+        income = totals.get('credit', 0)
+        outflow = totals.get('debit', 0)
 
         SubElement(root, 'feetotal').text = '0.00'
         SubElement(root, 'noncashorders').text = '0.00'
-        SubElement(root, 'income').text = f"{income:.2f}"
-        SubElement(root, 'outflow').text = f"{outflow:.2f}"
+        SubElement(root, 'income').text = format_minor(income)
+        SubElement(root, 'outflow').text = format_minor(outflow)
         SubElement(root, 'accountfee').text = '0.00'
         SubElement(root, 'feecomment').text = 'Oslobođeno poreza po članu 25. Zakona o PDV.'
 
@@ -460,41 +1359,8 @@ class BankStatement:
         trnlist = SubElement(root, 'trnlist')
         trnlist.set('count', str(len(self.transactions)))
 
-        for trn in self.transactions:
-            stmttrn = SubElement(trnlist, 'stmttrn')
-
-            SubElement(stmttrn, 'trntype').text = trn.trntype
-            SubElement(stmttrn, 'fitid').text = trn.fitid
-            SubElement(stmttrn, 'trnuid')
-            SubElement(stmttrn, 'benefit').text = trn.benefit
-
-            payeeinfo = SubElement(stmttrn, 'payeeinfo')
-            SubElement(payeeinfo, 'name').text = trn.payee_name
-            SubElement(payeeinfo, 'city')
-
-            payeeaccountinfo = SubElement(stmttrn, 'payeeaccountinfo')
-            SubElement(payeeaccountinfo, 'acctid').text = trn.payee_account
-            SubElement(payeeaccountinfo, 'bankid')
-            SubElement(payeeaccountinfo, 'bankname').text = trn.payee_bank
-
-            SubElement(stmttrn, 'dtposted').text = trn.dtposted
-            SubElement(stmttrn, 'trnamt').text = f"{trn.trnamt:.2f}"
-            SubElement(stmttrn, 'purpose').text = trn.purpose
-            SubElement(stmttrn, 'purposecode').text = trn.purposecode
-            SubElement(stmttrn, 'curdef').text = self.currency
-            SubElement(stmttrn, 'payeerefnumber').text = trn.payee_refnumber
-            SubElement(stmttrn, 'trnplace').text = '999905 OfficeBanking'
-            SubElement(stmttrn, 'dtuser').text = trn.dtuser
-            SubElement(stmttrn, 'dtavail').text = trn.dtavail
-            SubElement(stmttrn, 'refnumber')
-            SubElement(stmttrn, 'refmodel')
-            SubElement(stmttrn, 'payeerefmodel').text = trn.payee_refmodel
-            SubElement(stmttrn, 'urgency').text = trn.urgency
-            SubElement(stmttrn, 'fee').text = '0'
-
-            statusinfo = SubElement(stmttrn, 'statusinfo')
-            SubElement(statusinfo, 'code').text = '80'
-            SubElement(statusinfo, 'timeposted').text = trn.dtposted
+        if transactions:
+            _append_stmttrns(trnlist, self.transactions, self.currency)
 
         rejected = SubElement(root, 'rejected')
         rejected.set('count', '0')
@@ -506,50 +1372,1492 @@ class BankStatement:
         SubElement(reserveditem, 'ordersum').text = '0'
         SubElement(reserveditem, 'comment')
 
+        self._timed('to_xml', start)
         return root
 
 
-def convert(html_file, output_file=None):
-    """Convert HTML to XML."""
-    html_path = Path(html_file)
-    if not html_path.exists():
-        raise FileNotFoundError(f"File not found: {html_file}")
+def _append_stmttrns(trnlist, transactions, currency):
+    """Append a ``stmttrn`` element per transaction to ``trnlist``."""
+    for trn in transactions:
+        stmttrn = SubElement(trnlist, 'stmttrn')
+
+        SubElement(stmttrn, 'trntype').text = trn.trntype
+        SubElement(stmttrn, 'fitid').text = trn.fitid
+        SubElement(stmttrn, 'trnuid')
+        SubElement(stmttrn, 'benefit').text = trn.benefit
+
+        payeeinfo = SubElement(stmttrn, 'payeeinfo')
+        SubElement(payeeinfo, 'name').text = trn.payee_name
+        SubElement(payeeinfo, 'city')
+
+        payeeaccountinfo = SubElement(stmttrn, 'payeeaccountinfo')
+        SubElement(payeeaccountinfo, 'acctid').text = trn.payee_account
+        SubElement(payeeaccountinfo, 'bankid')
+        SubElement(payeeaccountinfo, 'bankname').text = trn.payee_bank
+
+        SubElement(stmttrn, 'dtposted').text = trn.dtposted
+        SubElement(stmttrn, 'trnamt').text = f"{trn.trnamt:.2f}"
+        SubElement(stmttrn, 'purpose').text = trn.purpose
+        SubElement(stmttrn, 'purposecode').text = trn.purposecode
+        SubElement(stmttrn, 'curdef').text = currency
+        SubElement(stmttrn, 'payeerefnumber').text = trn.payee_refnumber
+        SubElement(stmttrn, 'trnplace').text = '999905 OfficeBanking'
+        SubElement(stmttrn, 'dtuser').text = trn.dtuser
+        SubElement(stmttrn, 'dtavail').text = trn.dtavail
+        SubElement(stmttrn, 'refnumber')
+        SubElement(stmttrn, 'refmodel')
+        SubElement(stmttrn, 'payeerefmodel').text = trn.payee_refmodel
+        SubElement(stmttrn, 'urgency').text = trn.urgency
+        SubElement(stmttrn, 'fee').text = '0'
+
+        statusinfo = SubElement(stmttrn, 'statusinfo')
+        SubElement(statusinfo, 'code').text = '80'
+        SubElement(statusinfo, 'timeposted').text = trn.dtposted
+
+
+def _decode_table_rows(rows, left, right, description):
+    """Decode ``(row, surplus)`` pairs into a TransactionTable (runs in a worker)."""
+    parser = BankStatement()
+    for row, surplus in rows:
+        trn = parser._parse_table_row(row, surplus, left, right, description)
+        if trn and trn.trnamt > 0:
+            parser.transactions.append(trn)
+    return parser.transactions
+
+
+def _escape_xml(data):
+    """Escape character data the way minidom writes it."""
+    return (data.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('"', '&quot;').replace('>', '&gt;'))
+
+
+def _normalize_newlines(data):
+    """Normalize line endings as the XML parser of the minidom round trip did."""
+    return data.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _split_lines(raw):
+    """Yield raw output split into lines, dropping whitespace-only ones."""
+    for line in raw.split('\n'):
+        if line.strip():
+            yield '\n' + line
+
+
+def _iter_pretty_lines(elem, pad, indent, fragments=None):
+    """Yield the pretty-printed lines of ``elem``, each prefixed with a newline.
+
+    ``fragments`` maps elements to already rendered child lines, yielded
+    after their own children.
+    """
+    tag = elem.tag
+    attrs = ''.join(f' {name}="{_escape_xml(value)}"' for name, value in elem.items())
+    text = _normalize_newlines(elem.text) if elem.text else ''
+    inserted = fragments.get(elem) if fragments else None
+    leaf = len(elem) == 0 and inserted is None
+
+    if leaf:
+        if text:
+            line = f'{pad}<{tag}{attrs}>{_escape_xml(text)}</{tag}>'
+        else:
+            line = f'{pad}<{tag}{attrs}/>'
+    else:
+        line = f'{pad}<{tag}{attrs}>'
+    if '\n' in line:
+        yield from _split_lines(line)
+    else:
+        yield '\n' + line
+    if leaf:
+        return
+
+    child_pad = pad + indent
+    if text:
+        yield from _split_lines(child_pad + _escape_xml(text))
+    for child in elem:
+        yield from _iter_pretty_lines(child, child_pad, indent, fragments)
+        if child.tail:
+            yield from _split_lines(child_pad + _escape_xml(_normalize_newlines(child.tail)))
+    if inserted is not None:
+        yield from inserted
+    yield f'\n{pad}</{tag}>'
+
+
+def iter_pretty_xml(root, indent='  ', chunk_size=65536, fragments=None):
+    """Yield the indented XML document in chunks of roughly ``chunk_size``.
+
+    The output is identical to serializing with ``tostring``, re-parsing
+    with ``minidom.parseString``, calling ``toprettyxml`` and dropping blank
+    lines, without building the intermediate string or DOM. ``fragments``
+    maps elements to pre-rendered children (see ``iter_statement_xml``).
+    """
+    buf = ['<?xml version="1.0" ?>']
+    size = 0
+    for line in _iter_pretty_lines(root, '', indent, fragments):
+        buf.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield ''.join(buf)
+
+
+def _render_stmttrns(transactions, currency, pad, indent):
+    """Pretty-print the ``stmttrn`` elements of a TransactionTable (runs in a worker)."""
+    trnlist = Element('trnlist')
+    _append_stmttrns(trnlist, transactions, currency)
+    return ''.join(line for stmttrn in trnlist
+                   for line in _iter_pretty_lines(stmttrn, pad, indent))
+
+
+def iter_statement_xml(statement, executor=None, indent='  '):
+    """Yield the pretty iBank XML of a statement in chunks.
+
+    With a process pool ``executor`` and at least PARALLEL_MIN_ROWS
+    transactions, the ``stmttrn`` elements are built and pretty-printed in
+    row-aligned chunks by the workers and stitched back in order; the output
+    is identical to ``iter_pretty_xml(statement.to_ibank_xml())``.
+    """
+    transactions = statement.transactions
+    if executor is None or len(transactions) < PARALLEL_MIN_ROWS:
+        yield from iter_pretty_xml(statement.to_ibank_xml(), indent)
+        return
+    root = statement.to_ibank_xml(transactions=False)
+    chunks = [transactions.section(i, i + PARALLEL_CHUNK_ROWS)
+              for i in range(0, len(transactions), PARALLEL_CHUNK_ROWS)]
+    # stmttrn elements sit two levels below the root
+    rendered = executor.map(_render_stmttrns, chunks, itertools.repeat(statement.currency),
+                            itertools.repeat(indent * 2), itertools.repeat(indent))
+    yield from iter_pretty_xml(root, indent, fragments={root.find('trnlist'): rendered})
+
+
+def write_pretty_xml(root, stream, indent='  '):
+    """Write the indented XML document incrementally to a text stream."""
+    for chunk in iter_pretty_xml(root, indent):
+        stream.write(chunk)
+
+
+# Flat transaction rows for the NDJSON/CSV/JSON writers
+ROW_FIELDS = (
+    'fitid', 'serial_no', 'benefit', 'trnamt', 'dtposted', 'dtavail', 'dtuser',
+    'payee_name', 'payee_account', 'payee_bank', 'payee_refnumber',
+    'payee_refmodel', 'purpose', 'purposecode', 'trntype', 'urgency',
+)
+_AMOUNT_INDEX = ROW_FIELDS.index('trnamt')
+
+
+def _statement_fields(statement):
+    return {
+        'account': statement.account_number,
+        'statement': statement.statement_number,
+        'date': statement.statement_date,
+        'currency': statement.currency,
+    }
+
+
+def _chunked(lines, chunk_size):
+    """Join an iterable of strings into chunks of roughly ``chunk_size``."""
+    buf = []
+    size = 0
+    for line in lines:
+        buf.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield ''.join(buf)
+
+
+def _iter_row_dicts(statement):
+    for values in statement.transactions.iter_rows(ROW_FIELDS):
+        row = dict(zip(ROW_FIELDS, values))
+        row['trnamt'] = values[_AMOUNT_INDEX] / 100
+        yield row
+
+
+def iter_ndjson(statement, chunk_size=65536):
+    """Yield one JSON object per transaction, newline delimited."""
+    fields = _statement_fields(statement)
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    return _chunked((dumps(dict(fields, **row)) + '\n' for row in _iter_row_dicts(statement)),
+                    chunk_size)
+
+
+def iter_csv(statement, chunk_size=65536):
+    """Yield the transactions as CSV with a header row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(('account', 'currency') + ROW_FIELDS)
+    prefix = (statement.account_number, statement.currency)
+    for values in statement.transactions.iter_rows(ROW_FIELDS):
+        values = list(values)
+        values[_AMOUNT_INDEX] = format_minor(values[_AMOUNT_INDEX])
+        writer.writerow(prefix + tuple(values))
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_json(statement, chunk_size=65536):
+    """Yield a compact JSON document with the header and a transaction array."""
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    header = dict(_statement_fields(statement),
+                  iban=statement.iban,
+                  holder=statement.account_holder,
+                  beginning_balance=statement.beginning_balance,
+                  ending_balance=statement.ending_balance,
+                  total_debit=statement.total_debit,
+                  total_credit=statement.total_credit)
+
+    def parts():
+        yield dumps(header)[:-1] + ',"transactions":['
+        for i, row in enumerate(_iter_row_dicts(statement)):
+            yield (',' if i else '') + dumps(row)
+        yield ']}'
+    return _chunked(parts(), chunk_size)
+
+
+# format -> (writer, file suffix, MIME type)
+OUTPUT_FORMATS = {
+    'xml': (lambda statement: iter_pretty_xml(statement.to_ibank_xml()), '.xml', 'application/xml'),
+    'ndjson': (iter_ndjson, '.ndjson', 'application/x-ndjson'),
+    'csv': (iter_csv, '.csv', 'text/csv'),
+    'json': (iter_json, '.json', 'application/json'),
+}
+
+
+def iter_output(statement, fmt='xml'):
+    """Yield a parsed statement rendered in one of OUTPUT_FORMATS."""
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    return OUTPUT_FORMATS[fmt][0](statement)
+
+
+def _iso_to_date(value):
+    """Convert an ISO ``YYYY-MM-DDT...`` timestamp back to DD.MM.YYYY."""
+    parts = value[:10].split('-')
+    return '.'.join(reversed(parts)) if len(parts) == 3 else value
+
+
+def _iter_xml_events(source):
+    parser = XMLPullParser(events=('start', 'end'))
+    for chunk in iter_byte_chunks(source):
+        parser.feed(chunk)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+# BankStatement fields the iBank XML leaves out or reformats
+HEADER_FIELDS = ('account_number', 'iban', 'account_holder', 'beginning_balance', 'statement_date')
+
+
+def statement_header(statement):
+    """Return the header fields ``read_ibank_xml`` cannot recover from the XML."""
+    return {name: getattr(statement, name) for name in HEADER_FIELDS}
+
+
+def read_ibank_xml(source, header=None):
+    """Load an iBank XML document into a BankStatement.
+
+    ``source`` is anything ``iter_byte_chunks`` accepts. Transactions are
+    consumed and discarded one ``stmttrn`` at a time, so the document tree
+    never holds more than the header. The XML has no beginning balance, so
+    it is derived from the ending balance and the transaction totals;
+    ``header`` (from ``statement_header``) restores the original fields.
+    """
+    statement = BankStatement()
+    root = trnlist = None
+    for event, elem in _iter_xml_events(source):
+        if event == 'start':
+            if root is None:
+                root = elem
+            elif elem.tag == 'trnlist':
+                trnlist = elem
+            continue
+        if elem.tag != 'stmttrn' or trnlist is None:
+            continue
+        trn = Transaction()
+        trn.fitid = elem.findtext('fitid') or ''
+        trn.trntype = elem.findtext('trntype') or trn.trntype
+        trn.benefit = elem.findtext('benefit') or trn.benefit
+        trn.payee_name = elem.findtext('payeeinfo/name') or ''
+        trn.payee_account = elem.findtext('payeeaccountinfo/acctid') or ''
+        trn.payee_bank = elem.findtext('payeeaccountinfo/bankname') or ''
+        trn.dtposted = elem.findtext('dtposted') or ''
+        trn.dtuser = elem.findtext('dtuser') or ''
+        trn.dtavail = elem.findtext('dtavail') or ''
+        trn.trnamt = float(elem.findtext('trnamt') or 0)
+        trn.purpose = elem.findtext('purpose') or ''
+        trn.purposecode = elem.findtext('purposecode') or ''
+        trn.payee_refnumber = elem.findtext('payeerefnumber') or ''
+        trn.payee_refmodel = elem.findtext('payeerefmodel') or ''
+        trn.urgency = elem.findtext('urgency') or ''
+        statement.transactions.append(trn)
+        trnlist.remove(elem)
+
+    if root is None or root.tag != 'pmtnotification':
+        raise ValueError("Not an iBank XML document")
+    statement.currency = root.findtext('curdef') or statement.currency
+    statement.account_number = re.sub(r'[^0-9]', '', root.findtext('acctid') or '')
+    statement.statement_number = root.findtext('stmtnumber') or ''
+    statement.ending_balance = float(root.findtext('ledgerbal/balamt') or 0)
+    statement.statement_date = _iso_to_date(root.findtext('ledgerbal/dtasof') or '')
+    statement.total_debit = statement.transactions.total('debit') / 100
+    statement.total_credit = statement.transactions.total('credit') / 100
+    statement.beginning_balance = (to_minor(statement.ending_balance)
+                                   - statement.transactions.total('credit')
+                                   + statement.transactions.total('debit')) / 100
+    for name, value in (header or {}).items():
+        if name in HEADER_FIELDS:
+            setattr(statement, name, value)
+    return statement
+
+
+# Byte input. Statements arrive as bytes, memory maps or binary streams and
+# are decoded to text in chunks.
+TEXT_CHUNK_BYTES = 1024 * 1024
+
+# Encoding of exports without a BOM or charset declaration that are not UTF-8
+FALLBACK_ENCODING = 'windows-1250'
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+_CHARSET_RE = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+_XML_ENCODING_RE = re.compile(rb'<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9_.:-]+)')
+
+
+def detect_encoding(head):
+    """Return the text encoding of statement bytes from their first bytes.
+
+    A BOM wins over a ``<meta charset>`` (or ``http-equiv``) or XML
+    declaration; without either, UTF-8 is assumed if the bytes decode as
+    UTF-8, and FALLBACK_ENCODING otherwise. Use ``guess_encoding`` to know
+    whether the result was declared or guessed.
+    """
+    return guess_encoding(head)[0]
+
+
+def guess_encoding(head):
+    """Like ``detect_encoding``, returning ``(encoding, guessed)``.
+
+    ``guessed`` is True when nothing in the head declares the encoding.
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding, False
+    match = _CHARSET_RE.search(head) or _XML_ENCODING_RE.match(head)
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name, False
+        except LookupError:
+            pass
+    try:
+        # Not final: the head may end inside a multi-byte character
+        codecs.getincrementaldecoder('utf-8')().decode(head, False)
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING, True
+    return 'utf-8', True
+
+
+def iter_byte_chunks(source, chunk_size=TEXT_CHUNK_BYTES):
+    """Yield the bytes of ``source`` in chunks.
+
+    ``source`` is a bytes-like object, an ``mmap``, a binary file object, a
+    path, or an iterator that already yields byte chunks.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from iter_byte_chunks(f, chunk_size)
+    elif isinstance(source, mmap.mmap):
+        # Slices are copies, so no buffer export outlives the map
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+    else:
+        yield from source
+
+
+def iter_text_chunks(chunks, encoding=None):
+    """Decode byte chunks to str chunks the way a text-mode read does.
+
+    The encoding is detected from the first chunk unless given. Invalid
+    bytes are replaced, except when UTF-8 was only guessed from a head
+    without a BOM or charset: then the decoding is strict and raises
+    UnicodeDecodeError, so the caller can re-read the input as
+    FALLBACK_ENCODING instead of silently losing text. Newlines are
+    normalised to ``\\n`` even when a ``\\r\\n`` pair straddles two chunks.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+    errors = 'replace'
+    if encoding is None:
+        encoding, guessed = guess_encoding(bytes(first[:SNIFF_BYTES]))
+        if guessed and encoding == 'utf-8':
+            errors = 'strict'
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    held = ''
+    for chunk in itertools.chain([first], chunks):
+        text = held + decoder.decode(chunk)
+        held = ''
+        if text.endswith('\r'):
+            text, held = text[:-1], '\r'
+        if text:
+            yield text.replace('\r\n', '\n').replace('\r', '\n')
+    text = held + decoder.decode(b'', True)
+    if text:
+        yield text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+# Statement formats. Each registered format has a sniffer that looks only at
+# the (lowercased) first SNIFF_BYTES of a file, and a parser taking the raw
+# bytes. Sniffers are tried in registration order.
+SNIFF_BYTES = 16 * 1024
+
+_HTML_MARKERS = (b'<html', b'<!doctype html', b'<table', b'<span')
+
+
+class UnsupportedFormatError(ValueError):
+    """The file is not in any registered statement format."""
+
+
+class StatementFormat:
+    """A registered statement format: a cheap byte sniffer and a parser."""
+
+    def __init__(self, name, description, sniff, parse, html):
+        self.name = name
+        self.description = description
+        self.sniff = sniff
+        self.parse = parse
+        self.html = html
+
+
+STATEMENT_FORMATS = {}
+
+
+def register_format(name, description, sniff, parse, html=True):
+    """Register a statement format.
+
+    ``sniff(head)`` gets the lowercased first SNIFF_BYTES of a file and
+    returns a bool; ``parse(chunks, backend, layout, executor)`` gets an
+    iterator of byte chunks and an optional process pool, and returns a
+    BankStatement. A parser may set ``source_format`` itself; otherwise it
+    is the name of the format.
+    """
+    STATEMENT_FORMATS[name] = StatementFormat(name, description, sniff, parse, html)
+
+
+def _is_erste_html(head):
+    return any(marker in head for marker in _HTML_MARKERS) and \
+        (b'erste bank' in head or b'izvod broj i datum' in head)
+
+
+def _sniff_erste_devizni(head):
+    if not _is_erste_html(head):
+        return False
+    if b'devizni izvod' in head:
+        return True
+    return b'dinarski izvod' not in head and b'valuta:' in head and b'valuta: rsd' not in head
+
+
+def _sniff_ibank_xml(head):
+    return b'<pmtnotification' in head and not any(marker in head for marker in _HTML_MARKERS)
+
+
+def _parse_erste_html(chunks, backend='bs4', layout='table', executor=None):
+    return BankStatement().parse_html(iter_text_chunks(chunks), backend, layout, executor)
+
+
+def _parse_ibank_xml(chunks, backend=None, layout=None, executor=None):
+    return read_ibank_xml(chunks)
+
+
+def _is_html(head):
+    return any(marker in head for marker in _HTML_MARKERS)
+
+
+def _parse_unmarked_html(chunks, backend='bs4', layout='table', executor=None):
+    """Parse HTML whose bank markers lie beyond SNIFF_BYTES (e.g. after a long <style>).
+
+    The file is accepted only if the Erste parser finds a statement header.
+    """
+    statement = _parse_erste_html(chunks, backend, layout, executor)
+    if not (statement.statement_number or statement.account_number):
+        raise UnsupportedFormatError("Unsupported statement format")
+    statement.source_format = 'erste-dinarski' if statement.currency == 'RSD' else 'erste-devizni'
+    return statement
+
+
+register_format('erste-devizni', 'Erste Bank devizni izvod (HTML)', _sniff_erste_devizni,
+                _parse_erste_html)
+register_format('erste-dinarski', 'Erste Bank dinarski izvod (HTML)', _is_erste_html,
+                _parse_erste_html)
+register_format('ibank-xml', 'iBank XML izvod', _sniff_ibank_xml, _parse_ibank_xml, html=False)
+# Last resort for HTML without a marker in its head; rejected at parse time
+# when no statement header is found
+register_format('erste-html', 'Erste Bank izvod (HTML)', _is_html, _parse_unmarked_html)
+
 
-    with open(html_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+def sniff_format(data):
+    """Return the StatementFormat of a file from its first bytes, or None."""
+    head = bytes(data[:SNIFF_BYTES])
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        # Sniffers look for ASCII markers
+        head = head.decode('utf-16', 'ignore').encode('utf-8')
+    head = head.lower()
+    for fmt in STATEMENT_FORMATS.values():
+        if fmt.sniff(head):
+            return fmt
+    return None
 
-    statement = BankStatement().parse_html(html_content)
-    xml_root = statement.to_ibank_xml()
 
-    xml_string = tostring(xml_root, encoding='unicode')
-    dom = minidom.parseString(xml_string)
-    pretty_xml = dom.toprettyxml(indent='  ')
-    pretty_xml = '\n'.join([line for line in pretty_xml.split('\n') if line.strip()])
+def check_format(data, html_only=False):
+    """Sniff ``data`` and return its StatementFormat.
+
+    Raises UnsupportedFormatError for unknown files (and for non-HTML
+    formats when ``html_only``) before anything is parsed.
+    """
+    fmt = sniff_format(data)
+    if fmt is None:
+        raise UnsupportedFormatError("Unsupported statement format")
+    if html_only and not fmt.html:
+        raise UnsupportedFormatError(f"Expected an HTML statement, got {fmt.description}")
+    return fmt
+
+
+def _source_position(source):
+    """Offset to rewind a seekable file source to, 0 for re-readable sources, else None."""
+    if isinstance(source, (str, os.PathLike, bytes, bytearray, memoryview, mmap.mmap)):
+        return 0
+    if hasattr(source, 'read'):
+        seekable = getattr(source, 'seekable', None)
+        return source.tell() if seekable is not None and seekable() else None
+    return None
+
+
+def _recode(chunks, encoding):
+    """Re-encode byte chunks in ``encoding`` as UTF-8, starting with a BOM."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    yield codecs.BOM_UTF8
+    for chunk in chunks:
+        yield decoder.decode(chunk).encode('utf-8')
+    yield decoder.decode(b'', True).encode('utf-8')
+
+
+def parse_statement(source, backend='bs4', layout='table', html_only=False, executor=None):
+    """Parse a statement with the parser of its sniffed format.
+
+    ``source`` is anything ``iter_byte_chunks`` accepts. The input is read in
+    chunks; with the stream backend an HTML statement is never held in
+    memory as a whole. An optional process pool ``executor`` decodes the
+    rows of large statements in parallel.
+
+    An input guessed to be UTF-8 that turns out not to be is parsed again
+    as FALLBACK_ENCODING; a source that cannot be read twice (a plain
+    iterator or unseekable stream) raises UnicodeDecodeError instead.
+    """
+    position = _source_position(source)
+    chunks = iter_byte_chunks(source)
+    first = next(chunks, b'')
+    fmt = check_format(first, html_only)
+    try:
+        statement = fmt.parse(itertools.chain([first], chunks), backend, layout, executor)
+    except UnicodeDecodeError:
+        if position is None:
+            raise
+        if hasattr(source, 'read') and not isinstance(source, mmap.mmap):
+            source.seek(position)
+        # The BOM makes the parser decode the recoded text as UTF-8
+        chunks = _recode(iter_byte_chunks(source), FALLBACK_ENCODING)
+        statement = fmt.parse(chunks, backend, layout, executor)
+    statement.source_format = statement.source_format or fmt.name
+    return statement
+
+
+def parse_statement_file(path, backend='bs4', layout='table', html_only=False, executor=None):
+    """Parse a statement file through a read-only memory map."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return parse_statement(b'', backend, layout, html_only, executor)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse_statement(data, backend, layout, html_only, executor)
+
+
+def _render_xml(statement, write, executor=None):
+    """Pass the pretty XML of a statement to ``write`` chunk by chunk, timed."""
+    if executor is None:
+        xml_root = statement.to_ibank_xml()
+        start = time.perf_counter()
+        for chunk in iter_pretty_xml(xml_root):
+            write(chunk)
+        statement._timed('pretty', start)
+        return
+    # Transactions are rendered by the workers, so the XML tree and the
+    # pretty-printing are timed together
+    start = time.perf_counter()
+    for chunk in iter_statement_xml(statement, executor):
+        write(chunk)
+    statement.timings.pop('to_xml', None)
+    statement._timed('pretty', start)
+
+
+def _pretty_text(statement, executor=None):
+    parts = []
+    _render_xml(statement, parts.append, executor)
+    return ''.join(parts)
+
+
+def convert_statement(source, backend='bs4', layout='table', html_only=False, executor=None):
+    """Parse a statement and return a ``(statement, pretty XML string)`` pair.
+
+    ``source`` is anything ``parse_statement`` accepts.
+    """
+    statement = parse_statement(source, backend, layout, html_only, executor)
+    return statement, _pretty_text(statement, executor)
+
+
+def _convert_path(html_path, output_file, backend='bs4', fmt='xml', layout='table',
+                  executor=None):
+    """Convert one statement file and return the parsed statement."""
+    statement = parse_statement_file(html_path, backend, layout, executor=executor)
+
+    if fmt == 'xml':
+        with open(output_file, 'w', encoding='utf-8') as f:
+            _render_xml(statement, f.write, executor)
+    else:
+        start = time.perf_counter()
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            for chunk in iter_output(statement, fmt):
+                f.write(chunk)
+        statement._timed('write', start)
+
+    return statement
+
+
+def print_timings(statement):
+    """Print the per-stage timing summary of a converted statement."""
+    total = sum(statement.timings.values())
+    print(f"  Vreme po fazama ({statement.span_count} spanova):")
+    for stage, seconds in statement.timings.items():
+        share = seconds / total * 100 if total else 0.0
+        print(f"    {stage:<13} {seconds * 1000:9.2f} ms  {share:5.1f}%")
+    print(f"    {'ukupno':<13} {total * 1000:9.2f} ms")
+
+
+def convert(html_file, output_file=None, backend='bs4', timings=False, fmt='xml',
+            layout='table', workers=None):
+    """Convert HTML to XML (or another of OUTPUT_FORMATS).
+
+    With ``workers`` > 1 the rows and XML of a large statement are processed
+    by a pool of that many processes.
+    """
+    html_path = Path(html_file)
+    if not html_path.exists():
+        raise FileNotFoundError(f"File not found: {html_file}")
 
     if output_file is None:
-        output_file = html_path.with_suffix('.xml')
+        output_file = html_path.with_suffix(OUTPUT_FORMATS[fmt][1])
+    if Path(output_file).resolve() == html_path.resolve():
+        raise ValueError(f"Output file would overwrite the input: {output_file}")
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(pretty_xml)
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            statement = _convert_path(html_path, output_file, backend, fmt, layout, executor)
+    else:
+        statement = _convert_path(html_path, output_file, backend, fmt, layout)
 
     print(f"✓ {html_path.name}")
+    print(f"  Format: {STATEMENT_FORMATS[statement.source_format].description}")
     print(f"  Račun: {statement.account_number}")
     print(f"  Izvod #{statement.statement_number} - {statement.statement_date}")
     print(f"  Valuta: {statement.currency}")
     print(f"  Stanje: {statement.ending_balance:.2f} {statement.currency}")
     print(f"  Transakcije: {len(statement.transactions)}")
+    if timings:
+        print_timings(statement)
 
     return output_file
 
 
+def _write_output(statement, output_file, fmt='xml'):
+    """Write a statement in one of OUTPUT_FORMATS to a file."""
+    # CSV rows carry their own line endings
+    with open(output_file, 'w', encoding='utf-8', newline=None if fmt == 'xml' else '') as f:
+        for chunk in iter_output(statement, fmt):
+            f.write(chunk)
+
+
+def _batch_convert_one(html_file, known_hash=None, backend='bs4', layout='table', fmt='xml'):
+    """Convert one file in batch mode, skipping it if its hash is unchanged.
+
+    Runs in a worker process and returns a report entry.
+    """
+    started = time.perf_counter()
+    html_path = Path(html_file)
+    output_file = html_path.with_suffix(OUTPUT_FORMATS[fmt][1])
+    result = {'file': str(html_path), 'output': str(output_file)}
+    try:
+        data = html_path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        result['sha256'] = digest
+        if digest == known_hash and output_file.exists():
+            result['status'] = 'skipped'
+        else:
+            statement = parse_statement(data, backend, layout, html_only=True)
+            # Write next to the final name and rename, so readers never see a partial file
+            tmp_file = output_file.with_name(f".{output_file.name}.tmp")
+            _write_output(statement, tmp_file, fmt)
+            os.replace(tmp_file, output_file)
+            result.update({
+                'status': 'converted',
+                'account': statement.account_number,
+                'statement': statement.statement_number,
+                'date': statement.statement_date,
+                'currency': statement.currency,
+                'transactions': len(statement.transactions),
+            })
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def _load_manifest(manifest_path):
+    """Load the batch manifest mapping input paths to content hashes.
+
+    Entries written by another converter version are dropped, so their
+    files are converted again.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('converter') != CONVERTER_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def _save_manifest(manifest_path, files):
+    """Atomically write the batch manifest."""
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'converter': CONVERTER_VERSION, 'files': files},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _print_batch_result(result):
+    name = Path(result['file']).name
+    if result['status'] == 'converted':
+        print(f"✓ {name} ({result['transactions']} transakcija)")
+    elif result['status'] == 'skipped':
+        print(f"↷ {name} (nepromenjen)")
+    else:
+        print(f"✗ {name}: {result['error']}")
+
+
+def run_batch(paths, jobs=None, manifest_path=DEFAULT_MANIFEST, report_path=None,
+              backend='bs4', force=False, layout='table', fmt='xml'):
+    """Convert many statements in a process pool.
+
+    Directories are scanned for STATEMENT_PATTERNS, glob patterns are
+    expanded. Inputs whose content hash matches the manifest (and whose XML
+    still exists) are skipped. Returns the report dict.
+    """
+    started = time.perf_counter()
+    files = []
+    seen = set()
+    for path in _collect_html_files(paths, STATEMENT_PATTERNS):
+        key = str(path.resolve())
+        if key not in seen:
+            seen.add(key)
+            files.append(key)
+
+    manifest = {} if manifest_path is None else _load_manifest(manifest_path)
+    known = {} if force else {f: manifest.get(f, {}).get('sha256') for f in files}
+
+    results = []
+
+    def record(result):
+        results.append(result)
+        _print_batch_result(result)
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(files) <= 1:
+        for f in files:
+            record(_batch_convert_one(f, known.get(f), backend, layout, fmt))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_batch_convert_one, f, known.get(f), backend, layout, fmt)
+                       for f in files]
+            for future in as_completed(futures):
+                record(future.result())
+
+    results.sort(key=lambda r: r['file'])
+    for result in results:
+        if result['status'] in ('converted', 'skipped'):
+            manifest[result['file']] = {'sha256': result['sha256'], 'output': result['output']}
+        else:
+            manifest.pop(result['file'], None)
+    if manifest_path is not None:
+        _save_manifest(manifest_path, manifest)
+
+    counts = {status: sum(1 for r in results if r['status'] == status)
+              for status in ('converted', 'skipped', 'failed')}
+    report = dict(counts, total=len(results), jobs=jobs,
+                  seconds=round(time.perf_counter() - started, 4), files=results)
+
+    print("\n==========================================")
+    if not results:
+        print("Nije pronađen nijedan HTML izvod.")
+        print(f"Traženo: {', '.join(repr(p) for p in STATEMENT_PATTERNS)}")
+    else:
+        print("✓ Konverzija završena")
+        print(f"  Konvertovano: {counts['converted']}")
+        print(f"  Preskočeno (nepromenjeno): {counts['skipped']}")
+        if counts['failed']:
+            print(f"  Neuspešno: {counts['failed']}")
+        print(f"  Vreme: {report['seconds']:.2f}s ({jobs} procesa)")
+    print("==========================================")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    return report
+
+
+def is_archive(path):
+    """True if ``path`` names a ZIP or tar archive (by suffix)."""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def sniff_archive(head):
+    """Return ``'zip'`` or ``'tar'`` from the first 512 bytes of an archive, else None.
+
+    gzip, bzip2 and xz data is taken to be a compressed tar.
+    """
+    if head.startswith((b'PK\x03\x04', b'PK\x05\x06')):
+        return 'zip'
+    if head.startswith((b'\x1f\x8b', b'BZh', b'\xfd7zXZ\x00')) or head[257:262] == b'ustar':
+        return 'tar'
+    return None
+
+
+def _is_statement_member(name):
+    """HTML members, skipping hidden files and macOS resource forks."""
+    parts = PurePosixPath(name).parts
+    return bool(parts) and parts[-1].lower().endswith(('.html', '.htm')) \
+        and not any(part.startswith('.') or part == '__MACOSX' for part in parts)
+
+
+def _read_member(member, max_size):
+    data = member.read() if max_size is None else member.read(max_size + 1)
+    return None if max_size is not None and len(data) > max_size else data
+
+
+def iter_archive_members(source, max_size=None):
+    """Yield ``(name, data)`` for every HTML member of a ZIP or tar archive.
+
+    ``source`` is a path or a seekable binary file. Members are read one at
+    a time, nothing is extracted to disk; tar archives are read as a stream,
+    so .tar.gz needs a single pass. ``data`` is None for a member larger than
+    ``max_size`` bytes.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from iter_archive_members(f, max_size)
+        return
+
+    head = source.read(512)
+    source.seek(0)
+    kind = sniff_archive(head)
+    if kind == 'zip':
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_statement_member(info.filename):
+                    continue
+                with archive.open(info) as member:
+                    data = _read_member(member, max_size)
+                yield info.filename, data
+    elif kind == 'tar':
+        with tarfile.open(fileobj=source, mode='r|*') as archive:
+            for info in archive:
+                if info.isfile() and _is_statement_member(info.name):
+                    yield info.name, _read_member(archive.extractfile(info), max_size)
+    else:
+        raise UnsupportedFormatError("Unsupported archive format, expected ZIP or tar")
+
+
+def archive_output_name(name, suffix, used):
+    """Output path inside the result archive for member ``name``, unique in ``used``."""
+    path = PurePosixPath(*(part for part in PurePosixPath(name).parts if part != '/'))
+    output = str(path.with_suffix(suffix))
+    counter = 2
+    while output in used:
+        output = str(path.with_name(f"{path.stem}_{counter}{suffix}"))
+        counter += 1
+    used.add(output)
+    return output
+
+
+def _convert_member(name, data, backend='bs4', layout='table', fmt='xml'):
+    """Convert one archive member; runs in a worker process.
+
+    Returns a report entry and the converted bytes (None on failure).
+    """
+    started = time.perf_counter()
+    result = {'file': name}
+    output = None
+    try:
+        statement = parse_statement(data, backend, layout, html_only=True)
+        output = ''.join(iter_output(statement, fmt)).encode('utf-8')
+        result.update({
+            'status': 'converted',
+            'account': statement.account_number,
+            'statement': statement.statement_number,
+            'date': statement.statement_date,
+            'currency': statement.currency,
+            'transactions': len(statement.transactions),
+        })
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result, output
+
+
+def convert_archive(members, executor=None, backend='bs4', layout='table', fmt='xml',
+                    window=8):
+    """Yield ``(result, output)`` for ``(name, data)`` members, in archive order.
+
+    With an executor at most ``window`` members are in flight at once, so
+    memory stays bounded however large the archive is.
+    """
+    if executor is None:
+        for name, data in members:
+            yield _convert_member(name, data, backend, layout, fmt)
+        return
+    pending = deque()
+    for name, data in members:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(_convert_member, name, data, backend, layout, fmt))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _open_output_archive(path):
+    """Open a ZIP, tar or tar.gz archive for writing, chosen by suffix."""
+    name = str(path).lower()
+    if name.endswith('.zip'):
+        return zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+    return tarfile.open(path, 'w:gz' if name.endswith(('.gz', '.tgz')) else 'w')
+
+
+def _add_to_archive(archive, name, data):
+    if isinstance(archive, zipfile.ZipFile):
+        archive.writestr(name, data)
+    else:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        archive.addfile(info, io.BytesIO(data))
+
+
+def run_archive(archive_path, output_path=None, jobs=None, backend='bs4', layout='table',
+                fmt='xml', report_path=None):
+    """Convert every HTML statement in a ZIP or tar archive into an output archive.
+
+    Members are streamed from the input into a process pool and the results
+    written, in archive order, to ``output_path`` (default
+    ``<name>_<format>.zip``) together with a manifest.json. Returns the
+    report dict.
+    """
+    started = time.perf_counter()
+    archive_path = Path(archive_path)
+    if not archive_path.exists():
+        raise FileNotFoundError(f"File not found: {archive_path}")
+    if output_path is None:
+        name = archive_path.name
+        stem = name[:len(name) - len(next(s for s in ARCHIVE_SUFFIXES if name.lower().endswith(s)))]
+        output_path = archive_path.with_name(f"{stem}_{fmt}.zip")
+    output_path = Path(output_path)
+    if not is_archive(output_path):
+        raise ValueError(f"Output must be a {', '.join(ARCHIVE_SUFFIXES)} archive: {output_path}")
+    if output_path.resolve() == archive_path.resolve():
+        raise ValueError(f"Output file would overwrite the input: {output_path}")
+
+    jobs = jobs or os.cpu_count() or 1
+    suffix = OUTPUT_FORMATS[fmt][1]
+    used = {'manifest.json'}
+    results = []
+    # Keep the final name's suffix, it selects the archive type
+    tmp_path = output_path.with_name(f".tmp-{output_path.name}")
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        with _open_output_archive(tmp_path) as archive:
+            members = iter_archive_members(archive_path)
+            for result, output in convert_archive(members, executor, backend, layout, fmt,
+                                                  window=2 * jobs):
+                if output is not None:
+                    result['output'] = archive_output_name(result['file'], suffix, used)
+                    _add_to_archive(archive, result['output'], output)
+                results.append(result)
+                _print_batch_result(result)
+
+            counts = {status: sum(1 for r in results if r['status'] == status)
+                      for status in ('converted', 'failed')}
+            report = dict(counts, total=len(results), jobs=jobs, archive=str(archive_path),
+                          output=str(output_path), files=results)
+            _add_to_archive(archive, 'manifest.json',
+                            json.dumps(report, ensure_ascii=False, indent=2).encode('utf-8'))
+        os.replace(tmp_path, output_path)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if tmp_path.exists():
+            tmp_path.unlink()
+    report['seconds'] = round(time.perf_counter() - started, 4)
+
+    print("\n==========================================")
+    if not results:
+        print(f"Arhiva {archive_path.name} ne sadrži HTML izvode.")
+    else:
+        print(f"✓ Arhiva konvertovana: {output_path}")
+        print(f"  Konvertovano: {counts['converted']}")
+        if counts['failed']:
+            print(f"  Neuspešno: {counts['failed']}")
+        print(f"  Vreme: {report['seconds']:.2f}s ({jobs} procesa)")
+    print("==========================================")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    return report
+
+
+def _scan_statements(directory):
+    """Return ``{resolved path: (mtime_ns, size)}`` of statements in a directory."""
+    found = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if any(fnmatch.fnmatchcase(entry.name, pattern) for pattern in STATEMENT_PATTERNS) \
+               and entry.is_file():
+                stat = entry.stat()
+                found[os.path.realpath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+def _init_watch_worker():
+    # Signals are handled by the watcher, which lets running conversions finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_watch(directory, jobs=None, manifest_path=None, backend='bs4', layout='table',
+              interval=WATCH_INTERVAL, settle=WATCH_SETTLE, fmt='xml'):
+    """Convert statements as they appear or change in ``directory``, until interrupted.
+
+    The directory is polled every ``interval`` seconds; a file is converted
+    once its size and mtime have been stable for ``settle`` seconds, so files
+    still being copied are not picked up. Conversions run in one long-lived
+    process pool. The manifest (default: inside ``directory``) also stores
+    each file's size and mtime, so a restarted watcher does not even re-read
+    files that are already converted. SIGINT and SIGTERM stop the watcher
+    after running conversions finish.
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise NotADirectoryError(f"Not a directory: {directory}")
+    if manifest_path is None:
+        manifest_path = directory / DEFAULT_MANIFEST
+    manifest = _load_manifest(manifest_path)
+    done = {path: (entry['mtime_ns'], entry['size'])
+            for path, entry in manifest.items() if 'mtime_ns' in entry}
+    pending = {}    # path -> (stat, monotonic time it was first seen with that stat)
+    running = {}    # future -> (path, stat)
+    jobs = jobs or os.cpu_count() or 1
+
+    def collect(futures):
+        for future in futures:
+            path, stat = running.pop(future)
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process died
+                result = {'file': path, 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+            _print_batch_result(result)
+            # Failed files are retried only after they change again
+            done[path] = stat
+            if result['status'] == 'failed':
+                manifest.pop(path, None)
+            else:
+                manifest[path] = {'sha256': result['sha256'], 'output': result['output'],
+                                  'mtime_ns': stat[0], 'size': stat[1]}
+
+    # Stop the same way on SIGTERM (docker stop, systemd) as on Ctrl+C
+    signal.signal(signal.SIGTERM, _interrupt)
+    print(f"Pratim {directory} ({jobs} procesa, Ctrl+C za prekid)")
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_watch_worker)
+    try:
+        while True:
+            now = time.monotonic()
+            found = _scan_statements(directory)
+            busy = {path for path, _ in running.values()}
+            for path in list(pending):
+                if path not in found:
+                    del pending[path]
+            for path, stat in found.items():
+                if done.get(path) == stat or path in busy:
+                    continue
+                seen = pending.get(path)
+                if seen is None or seen[0] != stat:
+                    pending[path] = (stat, now)
+                elif now - seen[1] >= settle:
+                    del pending[path]
+                    known = manifest.get(path, {}).get('sha256')
+                    try:
+                        future = executor.submit(_batch_convert_one, path, known, backend, layout,
+                                                 fmt)
+                    except BrokenProcessPool:
+                        # A worker died; start a fresh pool and pick the file up next scan
+                        executor.shutdown(wait=False)
+                        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_watch_worker)
+                        continue
+                    running[future] = (path, stat)
+
+            finished = [future for future in running if future.done()]
+            if finished:
+                collect(finished)
+                _save_manifest(manifest_path, manifest)
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nPraćenje zaustavljeno")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        collect(list(running))
+        _save_manifest(manifest_path, manifest)
+
+
+def _collect_html_files(paths, patterns=None):
+    """Expand files, directories and glob patterns into a list of HTML files.
+
+    Directories are filtered with ``patterns`` when given, otherwise every
+    .html/.htm file in them is taken.
+    """
+    files = []
+    for item in paths:
+        path = Path(item)
+        if path.is_dir():
+            if patterns:
+                matches = {p for pattern in patterns for p in path.glob(pattern)}
+            else:
+                matches = (p for p in path.iterdir()
+                           if p.suffix.lower() in ('.html', '.htm'))
+            files.extend(sorted(matches))
+        elif not path.exists() and any(c in item for c in '*?['):
+            files.extend(sorted(Path(p) for p in glob.glob(item) if os.path.isfile(p)))
+        else:
+            files.append(path)
+    return files
+
+
+def _statement_order(statement):
+    """Sort key placing statements in date, then statement-number order."""
+    parts = statement.statement_date.split('.')
+    date = tuple(reversed(parts)) if len(parts) == 3 else ()
+    number = statement.statement_number
+    return (date, int(number) if number.isdigit() else 0, number)
+
+
+def _transaction_key(trn):
+    """Deduplication key: the FT reference, or a composite of the row fields."""
+    if trn.fitid:
+        return trn.fitid
+    return (trn.dtposted, to_minor(trn.trnamt), trn.benefit, trn.payee_account,
+            trn.payee_refnumber, trn.purpose)
+
+
+def consolidate_statements(statements):
+    """Merge statements into one statement per account and currency.
+
+    Transactions repeated by overlapping exports are dropped through a hash
+    index on ``fitid`` (composite key for rows without one). Identical rows
+    that occur several times within one statement are kept as many times as
+    the statement lists them. The result is ordered by ``dtposted``, opens
+    with the first statement's balance and closes with the last one's.
+
+    Returns a list of ``(statement, info)`` pairs where ``info`` reports the
+    sources, duplicate count and any breaks in the balance chain.
+    """
+    groups = {}
+    for statement in statements:
+        groups.setdefault((statement.account_number, statement.currency), []).append(statement)
+
+    results = []
+    for (account, currency), group in groups.items():
+        group.sort(key=_statement_order)
+
+        merged = BankStatement()
+        seen = set()
+        kept = []
+        duplicates = 0
+        breaks = []
+        previous = None
+        sources = []
+        for statement in group:
+            ident = (statement.statement_date, statement.statement_number)
+            if previous is not None and ident == (previous.statement_date, previous.statement_number):
+                duplicates += len(statement.transactions)
+                continue
+            if previous is not None and to_minor(statement.beginning_balance) != to_minor(previous.ending_balance):
+                breaks.append({
+                    'statement': statement.statement_number,
+                    'date': statement.statement_date,
+                    'expected': format_minor(to_minor(previous.ending_balance)),
+                    'found': format_minor(to_minor(statement.beginning_balance)),
+                })
+            sources.append(statement.statement_number)
+
+            occurrences = {}
+            for trn in statement.transactions:
+                key = _transaction_key(trn)
+                nth = occurrences.get(key, 0)
+                occurrences[key] = nth + 1
+                if (key, nth) in seen:
+                    duplicates += 1
+                    continue
+                seen.add((key, nth))
+                kept.append(trn)
+            previous = statement
+
+        first, last = group[0], previous
+        merged.account_number = account
+        merged.currency = currency
+        merged.iban = last.iban or first.iban
+        merged.account_holder = last.account_holder or first.account_holder
+        merged.statement_number = last.statement_number
+        merged.statement_date = last.statement_date
+        merged.beginning_balance = first.beginning_balance
+        merged.ending_balance = last.ending_balance
+
+        kept.sort(key=lambda trn: trn.dtposted)
+        merged.transactions.extend(kept)
+        merged.total_debit = merged.transactions.total('debit') / 100
+        merged.total_credit = merged.transactions.total('credit') / 100
+
+        results.append((merged, {
+            'account': account,
+            'currency': currency,
+            'from': first.statement_date,
+            'to': last.statement_date,
+            'statements': sources,
+            'transactions': len(merged.transactions),
+            'duplicates': duplicates,
+            'balance_breaks': breaks,
+        }))
+    return results
+
+
+def consolidated_filename(info, suffix='.xml'):
+    """Output file name for a consolidated statement."""
+    def compact(date):
+        parts = date.split('.')
+        return ''.join(reversed(parts)) if len(parts) == 3 else 'nepoznato'
+    return f"{info['account'] or 'racun'}_{info['currency']}_{compact(info['from'])}-{compact(info['to'])}{suffix}"
+
+
+def _parse_statement_file(html_file, backend='bs4', layout='table'):
+    """Parse one statement file; runs in a worker process."""
+    return parse_statement_file(html_file, backend, layout)
+
+
+def run_consolidate(paths, output_dir='.', jobs=None, backend='bs4', layout='table', fmt='xml'):
+    """Parse statements in a process pool and write one XML per account.
+
+    Files that fail to parse are reported and left out. Returns the list
+    of consolidation info dicts (empty if no statement could be parsed).
+    """
+    files = sorted({str(p.resolve()) for p in _collect_html_files(paths, STATEMENT_PATTERNS)})
+    if not files:
+        print("Nije pronađen nijedan HTML izvod.")
+        return []
+
+    jobs = jobs or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 and len(files) > 1 else None
+    statements = []
+    try:
+        if executor is None:
+            pending = [(html_file, None) for html_file in files]
+        else:
+            pending = [(html_file, executor.submit(_parse_statement_file, html_file, backend, layout))
+                       for html_file in files]
+        for html_file, future in pending:
+            try:
+                if future is None:
+                    statements.append(_parse_statement_file(html_file, backend, layout))
+                else:
+                    statements.append(future.result())
+            except Exception as e:
+                print(f"✗ {Path(html_file).name}: {type(e).__name__}: {e}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if not statements:
+        print("Nijedan izvod nije uspešno učitan.")
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = consolidate_statements(statements)
+    for statement, info in results:
+        output_file = Path(output_dir) / consolidated_filename(info, OUTPUT_FORMATS[fmt][1])
+        _write_output(statement, output_file, fmt)
+        info['output'] = str(output_file)
+        print(f"✓ {output_file.name}")
+        print(f"  Račun: {info['account']} ({info['currency']}), {info['from']} - {info['to']}")
+        print(f"  Izvoda: {len(info['statements'])}, transakcija: {info['transactions']}, "
+              f"duplikata: {info['duplicates']}")
+        for gap in info['balance_breaks']:
+            print(f"  ⚠ Izvod #{gap['statement']} ({gap['date']}): početno stanje {gap['found']}, "
+                  f"očekivano {gap['expected']}")
+    return results
+
+
+def _read_html_text(path):
+    """Decode an HTML file with its detected encoding, as ``parse_statement`` does."""
+    data = path.read_bytes()
+    try:
+        return ''.join(iter_text_chunks(iter_byte_chunks(data)))
+    except UnicodeDecodeError:
+        return ''.join(iter_text_chunks(iter_byte_chunks(data), FALLBACK_ENCODING))
+
+
+def run_parity(paths):
+    """Check the stream span backend against bs4 on a corpus of files."""
+    failed = 0
+    files = _collect_html_files(paths)
+    for path in files:
+        diff = check_span_parity(_read_html_text(path))
+        if diff is None:
+            print(f"✓ {path.name}")
+        else:
+            failed += 1
+            index, expected, actual = diff
+            print(f"✗ {path.name}: span #{index}")
+            print(f"  bs4:    {expected!r}")
+            print(f"  stream: {actual!r}")
+    print(f"\nProvereno: {len(files)}, razlike: {failed}")
+    return failed == 0
+
+
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="HTML → iBank XML Konverter")
+    parser.add_argument('html_file', nargs='?',
+                        help="ulazni HTML izvod ili arhiva izvoda (.zip, .tar, .tar.gz, .tgz)")
+    parser.add_argument('output_file', nargs='?',
+                        help="izlazni XML fajl (za arhivu: izlazna arhiva, podrazumevano <ime>_xml.zip)")
+    parser.add_argument('--backend', choices=SPAN_BACKENDS, default='bs4',
+                        help="način izdvajanja span teksta (podrazumevano: bs4)")
+    parser.add_argument('--layout', choices=TRANSACTION_LAYOUTS, default='table',
+                        help="čitanje transakcija po redovima tabele ili po redosledu spanova "
+                             "(podrazumevano: table)")
+    parser.add_argument('--parity', nargs='+', metavar='PATH',
+                        help="uporedi stream i bs4 backend na fajlovima/direktorijumima")
+    parser.add_argument('--batch', nargs='*', metavar='PATH',
+                        help="batch konverzija fajlova, direktorijuma i glob šablona "
+                             "(podrazumevano: tekući direktorijum)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="broj paralelnih procesa (podrazumevano: broj CPU jezgara; "
+                             "za jedan fajl: obrada velikog izvoda u N procesa, bez -j u jednom)")
+    parser.add_argument('--watch', metavar='DIR',
+                        help="prati direktorijum i konvertuj nove i izmenjene izvode")
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL,
+                        help=f"sekundi između provera direktorijuma (podrazumevano: {WATCH_INTERVAL})")
+    parser.add_argument('--settle', type=float, default=WATCH_SETTLE,
+                        help="sekundi koliko fajl mora biti nepromenjen pre konverzije "
+                             f"(podrazumevano: {WATCH_SETTLE})")
+    parser.add_argument('--manifest', default=None,
+                        help=f"manifest sa hešom obrađenih fajlova (podrazumevano: {DEFAULT_MANIFEST}, "
+                             "u --watch režimu unutar praćenog direktorijuma)")
+    parser.add_argument('--report', metavar='FILE',
+                        help="upiši JSON izveštaj batch konverzije ili konverzije arhive")
+    parser.add_argument('--force', action='store_true',
+                        help="konvertuj i nepromenjene fajlove")
+    parser.add_argument('--consolidate', nargs='+', metavar='PATH',
+                        help="spoji izvode po računu u jedan XML (fajlovi, direktorijumi, glob šabloni)")
+    parser.add_argument('-o', '--output-dir', default='.',
+                        help="direktorijum za spojene XML fajlove (podrazumevano: tekući)")
+    parser.add_argument('-f', '--format', choices=tuple(OUTPUT_FORMATS), default='xml',
+                        help="izlazni format (podrazumevano: xml)")
+    parser.add_argument('--timings', action='store_true',
+                        help="prikaži vreme trajanja svake faze konverzije")
+    args = parser.parse_args()
+
+    if args.parity:
+        sys.exit(0 if run_parity(args.parity) else 1)
+
+    if args.consolidate:
+        sys.exit(0 if run_consolidate(args.consolidate, args.output_dir, args.jobs,
+                                      args.backend, args.layout, args.format) else 1)
+
+    if args.watch:
+        try:
+            run_watch(args.watch, args.jobs, args.manifest, args.backend, args.layout,
+                      args.interval, args.settle, args.format)
+        except NotADirectoryError as e:
+            print(f"✗ Greška: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.batch is not None:
+        report = run_batch(args.batch or ['.'], args.jobs, args.manifest or DEFAULT_MANIFEST,
+                           args.report, args.backend, args.force, args.layout, args.format)
+        sys.exit(1 if report['failed'] else 0)
+
+    if not args.html_file:
         print("HTML → iBank XML Konverter")
         print("\nUpotreba: python convert_html_to_xml.py <html_file> [output_file]")
         sys.exit(1)
 
+    if is_archive(args.html_file):
+        try:
+            report = run_archive(args.html_file, args.output_file, args.jobs, args.backend,
+                                 args.layout, args.format, args.report)
+        except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+            print(f"✗ Greška: {e}")
+            sys.exit(1)
+        sys.exit(1 if report['failed'] else 0)
+
     try:
-        convert(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+        convert(args.html_file, args.output_file, args.backend, args.timings, args.format,
+                args.layout, args.jobs)
         print("\n✓ Konverzija uspešna!")
     except Exception as e:
         print(f"\n✗ Greška: {e}")
@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for the production serving mode.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+All settings can be overridden with environment variables (see
+docker-compose.yml).
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Worker processes and threads per worker. Threads beyond the admission
+# limit (ADMISSION_MAX_IN_FLIGHT) wait in the admission queue, so keep
+# threads >= ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE.
+workers = int(os.environ.get('WEB_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('WEB_THREADS', 8))
+worker_class = 'gthread'
+
+# Large statements can take a while to convert
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers after N requests (with jitter) to cap memory growth
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 500))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 50))
+
+# Import the app (and the converter) once in the master before forking
+preload_app = True
+
+# Workers publish their metrics here, so /metrics on any worker reports the
+# whole server (set before the app is imported)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'izvodi-metrics'))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Drop metric snapshots left by a previous run."""
+    from metrics import reset_directory
+    reset_directory(os.environ['METRICS_DIR'])
+
+
+def worker_exit(server, worker):
+    """Publish the last metrics held back by the snapshot throttle."""
+    from metrics import write_snapshot
+    write_snapshot(force=True)
+
+
+def child_exit(server, worker):
+    """Keep the counters of a recycled or crashed worker in the totals."""
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid, os.environ['METRICS_DIR'])
+
+
+def when_ready(server):
+    """Warm the converter in the master so forked workers start hot."""
+    from app import warm_up
+    warm_up()
+    server.log.info("Converter warmed up, spawning %s workers", workers)
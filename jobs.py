@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Local-disk job store for asynchronous conversions.
+
+Every job is a directory under the jobs root holding the uploaded HTML,
+a ``meta.json`` state file and, once finished, ``result.xml``. Keeping the
+state on disk lets any web worker process answer status and download
+requests, and lets a surviving process pick up jobs whose owner died.
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from convert_html_to_xml import convert_statement
+
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _write_json(path, data):
+    """Atomically write a JSON file."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _update_meta(job_dir, **changes):
+    """Merge changes into a job's meta.json."""
+    meta_path = job_dir / 'meta.json'
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    meta.update(changes, updated=time.time())
+    _write_json(meta_path, meta)
+    return meta
+
+
+def _pid_alive(pid):
+    """Check whether a process with the given pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(job_dir):
+    """Convert a queued job; runs in a worker process.
+
+    Progress is written to meta.json as the job moves through its stages.
+    """
+    job_dir = Path(job_dir)
+    _update_meta(job_dir, state=RUNNING, progress=10, started=time.time())
+    try:
+        statement, xml_text = convert_statement(job_dir / 'input.html', html_only=True)
+        _update_meta(job_dir, progress=90)
+        tmp_path = job_dir / 'result.xml.tmp'
+        tmp_path.write_bytes(xml_text.encode('utf-8'))
+        os.replace(tmp_path, job_dir / 'result.xml')
+    except Exception as e:
+        _update_meta(job_dir, state=FAILED, progress=100, error=str(e))
+        raise
+    return _update_meta(
+        job_dir, state=DONE, progress=100,
+        account=statement.account_number,
+        statement=statement.statement_number,
+        transactions=len(statement.transactions)
+    )
+
+
+class JobStore:
+    """Directory of conversion jobs with ownership and expiry."""
+
+    def __init__(self, directory, ttl=3600):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def job_dir(self, job_id):
+        """Return the directory of a job, or None for malformed ids."""
+        if not JOB_ID_RE.match(job_id):
+            return None
+        return self.directory / job_id
+
+    def create(self, filename, output_name, data, result=None):
+        """Create a job from uploaded bytes and claim it for this process.
+
+        When ``result`` is given (e.g. from the conversion cache) the job is
+        created already finished.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = self.directory / job_id
+        job_dir.mkdir()
+        (job_dir / 'input.html').write_bytes(data)
+        now = time.time()
+        meta = {
+            'id': job_id,
+            'filename': filename,
+            'output': output_name,
+            'state': QUEUED,
+            'progress': 0,
+            'created': now,
+            'updated': now,
+            'pid': os.getpid(),
+        }
+        if result is not None:
+            (job_dir / 'result.xml').write_bytes(result)
+            meta.update(state=DONE, progress=100, cached=True)
+        _write_json(job_dir / 'meta.json', meta)
+        return meta
+
+    def get(self, job_id):
+        """Return a job's meta dict, or None if unknown or expired."""
+        job_dir = self.job_dir(job_id)
+        if job_dir is None:
+            return None
+        try:
+            with open(job_dir / 'meta.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def result_path(self, job_id):
+        """Return the path of a finished job's XML."""
+        return self.job_dir(job_id) / 'result.xml'
+
+    def claim(self, job_id, owner_pid):
+        """Take over a job whose owning process died; True if we got it."""
+        job_dir = self.job_dir(job_id)
+        stale = job_dir / f'meta.json.claim-{owner_pid}'
+        try:
+            # Only one process can create the claim link for this owner.
+            os.link(job_dir / 'meta.json', stale)
+        except OSError:
+            return False
+        try:
+            meta = self.get(job_id)
+            if meta is None or meta['pid'] != owner_pid:
+                return False
+            _update_meta(job_dir, state=QUEUED, progress=0, pid=os.getpid())
+        finally:
+            stale.unlink()
+        return True
+
+    def sweep(self):
+        """Delete expired jobs and return ids of orphaned unfinished jobs."""
+        orphans = []
+        now = time.time()
+        for job_dir in self.directory.iterdir():
+            meta = self.get(job_dir.name)
+            if meta is None:
+                # Half-created or foreign entry; drop it once it is old enough
+                try:
+                    if now - job_dir.stat().st_mtime > self.ttl:
+                        shutil.rmtree(job_dir, ignore_errors=True)
+                except OSError:
+                    pass
+                continue
+            if meta['state'] in (DONE, FAILED):
+                if now - meta['updated'] > self.ttl:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+            elif meta['pid'] != os.getpid() and not _pid_alive(meta['pid']):
+                orphans.append((meta['id'], meta['pid']))
+        return orphans
+
+    def counts(self):
+        """Number of jobs per state."""
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job_dir in self.directory.iterdir():
+            meta = self.get(job_dir.name)
+            if meta is not None:
+                counts[meta['state']] = counts.get(meta['state'], 0) + 1
+        return counts
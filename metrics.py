@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Minimal in-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are kept per process. With a shared
+directory (``set_directory``) every process also writes a snapshot of its
+series there, and ``render`` adds up the snapshots of all processes, so a
+scrape of any gunicorn worker reports the whole server. Counters and
+histograms of exited workers are folded into an archive file
+(``mark_process_dead``) so totals never go backwards; their gauges are
+dropped.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_registry = []
+_directory = None
+
+# Snapshot of exited processes in the shared directory
+ARCHIVE_FILE = 'archive.json'
+
+# Minimum seconds between two snapshot writes of one process
+SNAPSHOT_INTERVAL = 1.0
+
+_write_lock = threading.Lock()
+_last_write = 0.0
+_pending_write = None
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(
+        name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally labelled."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        return dict(self._values)
+
+    def samples(self, values=None):
+        values = self._values if values is None else values
+        for key, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Gauge:
+    """Value that can go up and down, optionally read from a callback."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._function = None
+        with _lock:
+            _registry.append(self)
+
+    def set(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with _lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """Report ``function()`` at render time instead of a stored value."""
+        self._function = function
+
+    def snapshot(self):
+        if self._function is not None:
+            return {(): self._function()}
+        return dict(self._values)
+
+    def samples(self, values=None):
+        values = self.snapshot() if values is None else values
+        for key, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally labelled."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        return {key: [list(counts), total, count]
+                for key, (counts, total, count) in self._values.items()}
+
+    def samples(self, values=None):
+        values = self._values if values is None else values
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (self.name + '_bucket',
+                       _format_labels(self.labelnames, key, [('le', _format_value(bound))]),
+                       cumulative)
+            yield self.name + '_sum', _format_labels(self.labelnames, key), total
+            yield self.name + '_count', _format_labels(self.labelnames, key), count
+
+
+def set_directory(directory):
+    """Share metrics with the other processes through files in ``directory``."""
+    global _directory
+    os.makedirs(directory, exist_ok=True)
+    _directory = directory
+
+
+def reset_directory(directory):
+    """Remove the snapshots of a previous run (call once, before workers start)."""
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            os.unlink(os.path.join(directory, name))
+
+
+def _snapshot():
+    """This process's series as JSON: ``{name: {'kind': ..., 'series': [[labels, value]]}}``."""
+    with _lock:
+        return {metric.name: {'kind': metric.kind,
+                              'series': [[list(key), value]
+                                         for key, value in metric.snapshot().items()]}
+                for metric in _registry}
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_snapshot(force=False):
+    """Publish this process's series to the shared directory, if any.
+
+    At most one write per SNAPSHOT_INTERVAL; a call inside the interval
+    schedules a single write at its end instead. ``force`` writes now.
+    """
+    global _last_write, _pending_write
+    if _directory is None:
+        return
+    with _write_lock:
+        wait = _last_write + SNAPSHOT_INTERVAL - time.monotonic()
+        if wait > 0 and not force:
+            if _pending_write is None:
+                _pending_write = threading.Timer(wait, write_snapshot, kwargs={'force': True})
+                _pending_write.daemon = True
+                _pending_write.start()
+            return
+        if _pending_write is not None:
+            _pending_write.cancel()
+            _pending_write = None
+        _write_json(os.path.join(_directory, f"{os.getpid()}.json"), _snapshot())
+        _last_write = time.monotonic()
+
+
+def _add(kind, values, key, value):
+    if kind != 'histogram':
+        values[key] = values.get(key, 0) + value
+    elif key not in values:
+        values[key] = [list(value[0]), value[1], value[2]]
+    else:
+        series = values[key]
+        series[0] = [a + b for a, b in zip(series[0], value[0])]
+        series[1] += value[1]
+        series[2] += value[2]
+
+
+class _DirectoryLock:
+    """flock on the shared directory; a no-op where fcntl is unavailable."""
+
+    def __init__(self, directory, exclusive):
+        self.path = os.path.join(directory, '.lock')
+        if fcntl is None:
+            self.operation = None
+        else:
+            self.operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if self.operation is not None:
+            fcntl.flock(self.file, self.operation)
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+def mark_process_dead(pid, directory=None):
+    """Fold the counters and histograms of an exited process into the archive."""
+    directory = directory or _directory
+    if directory is None:
+        return
+    path = os.path.join(directory, f"{pid}.json")
+    with _DirectoryLock(directory, exclusive=True):
+        snapshot = _read_json(path)
+        if not snapshot:
+            return
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        archive = {name: (metric['kind'], {tuple(key): value for key, value in metric['series']})
+                   for name, metric in _read_json(archive_path).items()}
+        for name, metric in snapshot.items():
+            if metric['kind'] == 'gauge':
+                continue
+            values = archive.setdefault(name, (metric['kind'], {}))[1]
+            for key, value in metric['series']:
+                _add(metric['kind'], values, tuple(key), value)
+        _write_json(archive_path, {
+            name: {'kind': kind, 'series': [[list(key), value] for key, value in values.items()]}
+            for name, (kind, values) in archive.items()})
+        os.unlink(path)
+
+
+def _collect():
+    """Sum the snapshots of all processes in the shared directory."""
+    write_snapshot(force=True)
+    kinds = {metric.name: metric.kind for metric in _registry}
+    totals = {name: {} for name in kinds}
+    with _DirectoryLock(_directory, exclusive=False):
+        names = [name for name in os.listdir(_directory) if name.endswith('.json')]
+        snapshots = [(name, _read_json(os.path.join(_directory, name))) for name in names]
+    for file_name, snapshot in snapshots:
+        for name, metric in snapshot.items():
+            kind = kinds.get(name)
+            if kind is None or kind != metric['kind'] or \
+               (kind == 'gauge' and file_name == ARCHIVE_FILE):
+                continue
+            for key, value in metric['series']:
+                _add(kind, totals[name], tuple(key), value)
+    return totals
+
+
+def render():
+    """Return all registered metrics in the Prometheus text format."""
+    totals = _collect() if _directory is not None else None
+    lines = []
+    with _lock:
+        for metric in _registry:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            values = None if totals is None else totals[metric.name]
+            for name, labels, value in metric.samples(values):
+                lines.append(f"{name}{labels} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+In-memory store of the web interface pages.
+
+Each page is read once, compressed once (gzip, and brotli when the
+``brotli`` package is installed) and served from memory with a strong ETag
+per encoding. With ``reload`` enabled the files are re-read when their
+modification time changes, for editing pages during development.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Encodings in order of preference when the client accepts several
+ENCODINGS = ('br', 'gzip')
+
+
+class Asset:
+    """One page: its bytes, compressed variants and their ETags."""
+
+    def __init__(self, path):
+        self.path = path
+        stat = path.stat()
+        self.mtime_ns = stat.st_mtime_ns
+        self.mimetype = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        body = path.read_bytes()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # identity variant plus whichever compressed ones are smaller
+        self.variants = {None: (body, digest)}
+        compressed = {'gzip': gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body, quality=11)
+        for encoding, data in compressed.items():
+            if len(data) < len(body):
+                self.variants[encoding] = (data, f'{digest}-{encoding}')
+
+    def negotiate(self, accept_encodings):
+        """Return ``(encoding, body, etag)`` for an Accept-Encoding header.
+
+        ``accept_encodings`` is Werkzeug's parsed header; ``encoding`` is
+        None for the uncompressed body.
+        """
+        for encoding in ENCODINGS:
+            if encoding in self.variants and accept_encodings[encoding]:
+                return (encoding,) + self.variants[encoding]
+        return (None,) + self.variants[None]
+
+
+class StaticAssets:
+    """Thread-safe map of page names to loaded Assets."""
+
+    def __init__(self, directory, names, reload=False):
+        self.directory = Path(directory)
+        self.names = tuple(names)
+        self.reload = reload
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read and compress every page now (e.g. before forking workers)."""
+        for name in self.names:
+            self.get(name)
+
+    def get(self, name):
+        """Return the Asset for a page name, reading it on first use."""
+        asset = self._assets.get(name)
+        if asset is not None and not (self.reload and self._changed(asset)):
+            return asset
+        with self._lock:
+            asset = self._assets.get(name)
+            if asset is None or (self.reload and self._changed(asset)):
+                asset = self._assets[name] = Asset(self.directory / name)
+            return asset
+
+    @staticmethod
+    def _changed(asset):
+        try:
+            return os.stat(asset.path).st_mtime_ns != asset.mtime_ns
+        except OSError:
+            return False